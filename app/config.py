@@ -1,9 +1,73 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import List, Optional
 
 class Settings(BaseSettings):
     openai_api_key: str
     gpt_model_name: str = "gpt-4o-mini"
+    # Point at a compatible server (e.g. the benchmark stub) instead of api.openai.com
+    openai_base_url: Optional[str] = None
+    # Shared LLM client: rate budgets, retry policy and connection pool
+    llm_requests_per_minute: int = 500
+    llm_tokens_per_minute: int = 200000
+    llm_expected_completion_tokens: int = 512
+    llm_max_retries: int = 5
+    llm_backoff_base_seconds: float = 0.5
+    llm_backoff_max_seconds: float = 30.0
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_request_timeout_seconds: float = 120.0
+    # Maximum number of uploaded files processed concurrently by /api/pipeline/execute
+    max_concurrent_files: int = 4
+    # Token budget per chunk when filling long documents, and how many chunks are filled at once
+    fill_chunk_max_tokens: int = 3000
+    max_concurrent_chunks: int = 8
+    # Placeholder styles detected locally (see services/blank_detector.py); raw regexes are allowed too
+    blank_patterns: List[str] = ["brackets", "underscores"]
+    # Ask the model to identify blanks only when the local pass finds none
+    blank_detection_llm_fallback: bool = True
+    # Characters of surrounding text sent with each blank occurrence, on either side
+    blank_window_chars: int = 300
+    # On-disk cache of completions keyed by (model, messages, response_format)
+    completion_cache_enabled: bool = True
+    completion_cache_path: str = ".cache/completions.sqlite3"
+    completion_cache_max_entries: int = 10000
+    completion_cache_ttl_seconds: int = 7 * 24 * 3600
+    # Converted uploads kept in memory, keyed by the SHA-256 of the DOCX bytes
+    document_cache_max_entries: int = 128
+    # Background jobs: worker count, queue bound and where job state is persisted
+    job_workers: int = 2
+    job_queue_max_size: int = 100
+    job_data_dir: str = ".cache/jobs"
+    # How often unfinished jobs that no live worker holds are re-queued (e.g. after a worker died)
+    job_recovery_interval_seconds: float = 30.0
+    # How long finished jobs (status, result, outputs) are kept before their directory is deleted; 0 keeps them
+    job_retention_seconds: float = 7 * 24 * 3600
+    # Saved pipelines: SQLite store with version history, read cache size, and the legacy
+    # directory of <name>.json files imported into it on startup
+    pipeline_store_path: str = ".cache/pipelines.sqlite3"
+    pipeline_cache_entries: int = 256
+    pipeline_dir: str = "saved_pipelines"
+    # DOCX conversion worker processes: None = one per CPU, 0 = convert in a thread instead
+    conversion_workers: Optional[int] = None
+    conversion_pool_start_method: str = "spawn"
+    # Answer blanks whose names match keys in structured context (Key: value lines or JSON) without the model
+    prefill_enabled: bool = True
+    prefill_fuzzy_cutoff: float = 0.85
+    # Long context is indexed (BM25) and only the passages relevant to each batch of blanks are sent
+    context_retrieval_enabled: bool = True
+    context_retrieval_min_tokens: int = 1500
+    context_retrieval_top_k: int = 6
+    context_passage_tokens: int = 200
+    context_index_cache_entries: int = 32
+    # Bulk mail merge: most context rows packed into one completion, and completions in flight
+    mail_merge_rows_per_completion: int = 10
+    mail_merge_concurrency: int = 8
+    # Observability: log level/format, Prometheus metrics and the request header carrying trace IDs
+    log_level: str = "INFO"
+    log_format: str = "json"
+    metrics_enabled: bool = True
+    trace_header: str = "X-Trace-ID"
     
     class Config:
         env_file = ".env"
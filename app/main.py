@@ -1,17 +1,55 @@
-from fastapi import FastAPI, UploadFile, HTTPException, Form, File, BackgroundTasks
+from fastapi import FastAPI, UploadFile, HTTPException, Form, File, Request
 from fastapi.middleware.cors import CORSMiddleware
 from .services.document_converter import DocumentConverter
 from .services.openai_service import OpenAIService
+from .services.completion_cache import get_completion_cache
+from .services.document_cache import get_document_cache
+from .services.blank_detector import get_blank_detector
+from .services.context_resolver import ContextResolver
+from .services.docx_filler import OccurrenceValues, recover_values
+from .services.blank_index import BlankIndex
+from .services.substitution import substitute
+from .services.job_queue import JobQueueFull, COMPLETED, FAILED, current_job_id, get_job_queue
+from .services.mail_merge import MailMerge, archive_members, parse_rows
+from .services.zip_stream import ZipStreamWriter, iter_zip
+from .services.conversion_pool import get_conversion_pool
+from .services.llm_client import get_llm_client
+from .services.pipeline_store import get_pipeline_store
+from .services.pipeline_compiler import DOCUMENT_PRODUCERS, PipelineCompileError, PipelinePlan, PipelineStep, get_pipeline_plan
+from .services.metrics import HTTP_REQUEST_SECONDS, PIPELINE_BLOCK_SECONDS, new_trace_id, registry, trace_id_var
 from .models.schemas import DocumentFillRequest, DocumentFillResponse
+from .config import get_settings
+from .logging_config import configure_logging
+import asyncio
+import base64
 import json
-from typing import List
-from fastapi.responses import FileResponse, Response
-import io
-import os
+import logging
+from typing import List, Optional, Tuple
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
 from pathlib import Path
 import time
 
-app = FastAPI(title="Document Filler API")
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    configure_logging(settings.log_level, settings.log_format)
+    registry.enabled = settings.metrics_enabled
+    job_queue = get_job_queue()
+    job_queue.register("convert_and_fill", convert_and_fill_job)
+    job_queue.register("pipeline", pipeline_job)
+    job_queue.register("mail_merge", mail_merge_job)
+    await asyncio.to_thread(get_pipeline_store)  # Opens the store and imports any legacy saved_pipelines/*.json
+    await get_conversion_pool().start()
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    get_conversion_pool().shutdown()
+    await get_llm_client().aclose()
+
+app = FastAPI(title="Document Filler API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,63 +59,135 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Reuse the caller's trace ID when given one so logs can be joined across services
+    trace_header = get_settings().trace_header
+    trace_id = request.headers.get(trace_header) or new_trace_id()
+    token = trace_id_var.set(trace_id)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        trace_id_var.reset(token)
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code
+    )
+    response.headers[trace_header] = trace_id
+    return response
+
 @app.post("/convert-and-fill", response_model=DocumentFillResponse)
 async def convert_and_fill(
     file: UploadFile = File(...),
     request: str = Form(...)
 ):
     try:
-        print(f"\n[convert_and_fill] Starting processing for file: {file.filename}")
-        
         # Parse the JSON string from form data
         request_data = json.loads(request)
         request_obj = DocumentFillRequest(**request_data)
-        print(f"[convert_and_fill] Parsed request with batch_size: {request_obj.batch_size}")
         
         if not file.filename.endswith('.docx'):
-            print("[convert_and_fill] Error: Invalid file type")
             raise HTTPException(status_code=400, detail="Only .docx files are supported")
         
         # Read the file content
         file_content = await file.read()
-        print(f"[convert_and_fill] Read file content: {len(file_content)} bytes")
-        
-        # Convert DOCX to Markdown
-        converter = DocumentConverter()
-        markdown_text = converter.docx_to_markdown(file_content)
-        print(f"[convert_and_fill] Converted to markdown: {len(markdown_text)} characters")
-        print("[convert_and_fill] First 200 chars of markdown:", markdown_text[:200])
+        logger.info("convert_and_fill received %s", file.filename, extra={"bytes": len(file_content)})
         
-        # Initialize OpenAI service
-        print("[convert_and_fill] Initializing OpenAI service")
-        openai_service = OpenAIService()
-        
-        # Fill the blanks with batch processing
-        print("[convert_and_fill] Starting blank filling process")
-        filled_document = openai_service.fill_blanks(
-            markdown_text,
-            request_obj.context,
-            request_obj.example,
-            request_obj.batch_size
-        )
-        print("[convert_and_fill] Completed blank filling")
-        print("[convert_and_fill] First 200 chars of filled document:", filled_document[:200])
+        filled_document = await fill_document(file_content, request_obj)
         
         response = DocumentFillResponse(filled_document=filled_document)
-        print("[convert_and_fill] Response created, first 200 chars:", response.filled_document[:200])
         return response
 
     except json.JSONDecodeError:
-        print("[convert_and_fill] Error: Invalid JSON in request")
         raise HTTPException(status_code=400, detail="Invalid JSON in request field")
     except Exception as e:
-        print(f"[convert_and_fill] Error: {str(e)}")
+        logger.exception("convert_and_fill failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/convert-and-fill/stream")
+async def convert_and_fill_stream(
+    file: UploadFile = File(...),
+    request: str = Form(...)
+):
+    """Server-sent events: "started", one "value" per blank as it is generated, then "document"."""
+    try:
+        request_obj = DocumentFillRequest(**json.loads(request))
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON in request field")
+    if not file.filename.endswith('.docx'):
+        raise HTTPException(status_code=400, detail="Only .docx files are supported")
+    file_content = await file.read()
+    logger.info("convert_and_fill_stream received %s", file.filename, extra={"bytes": len(file_content)})
+
+    async def events():
+        try:
+            markdown_text = await get_conversion_pool().docx_to_markdown(file_content)
+            async for event in OpenAIService(use_cache=request_obj.use_cache).stream_fill_async(
+                markdown_text,
+                request_obj.context,
+                request_obj.example,
+                request_obj.batch_size
+            ):
+                yield event
+        except Exception as e:
+            # Headers are already sent, so failures are reported in-band
+            logger.exception("convert_and_fill_stream failed")
+            yield {"event": "error", "detail": str(e)}
+
+    return sse_response(events())
+
+def sse_response(events) -> StreamingResponse:
+    async def event_stream():
+        async for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def fill_document(file_content: bytes, request_obj: DocumentFillRequest, progress=None) -> str:
+    # Convert DOCX to Markdown
+    markdown_text = await get_conversion_pool().docx_to_markdown(file_content)
+    logger.debug("Converted to markdown: %d characters", len(markdown_text))
+    if progress:
+        progress({"stage": "converted", "characters": len(markdown_text)})
+    
+    # Initialize OpenAI service
+    openai_service = OpenAIService(use_cache=request_obj.use_cache)
+    
+    # Fill the blanks with batch processing
+    filled_document = await openai_service.fill_blanks_async(
+        markdown_text,
+        request_obj.context,
+        request_obj.example,
+        request_obj.batch_size
+    )
+    if progress:
+        progress({"stage": "filled", "characters": len(filled_document)})
+    return filled_document
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    completion_cache = get_completion_cache()
+    return {
+        "completions": completion_cache.stats() if completion_cache else {"enabled": False},
+        "documents": get_document_cache().stats()
+    }
+
 @app.post("/api/pipeline/execute")
 async def execute_pipeline(
     files: List[UploadFile] = File(...),
@@ -85,119 +195,254 @@ async def execute_pipeline(
 ):
     try:
         config = json.loads(pipeline_config)
-        results = []
-        
-        for file in files:
-            result = await process_file_through_pipeline(file, config['blocks'])
-            
-            # Convert binary content to base64 if it's DOCX
-            if result["metadata"].get("output_format") == "docx":
-                import base64
-                docx_content = result["metadata"].get("docx_content")
-                if docx_content:
-                    result["metadata"]["docx_content"] = base64.b64encode(docx_content).decode('utf-8')
-            
-            results.append({
-                "filename": file.filename,
-                "content": result["content"].decode('utf-8', errors='ignore') if isinstance(result["content"], bytes) else result["content"],
-                "metadata": result["metadata"]
-            })
-            
-        return {"results": results}
+        plan = await asyncio.to_thread(get_pipeline_plan, config)
+        uploads = [(file.filename, await file.read()) for file in files]
+        return await run_pipeline(uploads, plan)
+    except PipelineCompileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Pipeline execution error: {str(e)}")
+        logger.exception("Pipeline execution failed")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def process_file_through_pipeline(file: UploadFile, blocks: List[dict]):
+@app.post("/api/pipeline/execute/stream")
+async def execute_pipeline_stream(
+    files: List[UploadFile] = File(...),
+    pipeline_config: str = Form(...)
+):
+    """Streams a ZIP with each file's output as soon as it is ready, then manifest.json.
+
+    DOCX outputs are stored as binary and everything else as .md; the manifest carries
+    per-file metadata and errors but no document content.
+    """
+    try:
+        plan = await asyncio.to_thread(get_pipeline_plan, json.loads(pipeline_config))
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON in pipeline_config field")
+    except PipelineCompileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        stream_pipeline_archive(files, plan),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="pipeline-results.zip"'}
+    )
+
+async def stream_pipeline_archive(files: List[UploadFile], plan: PipelinePlan):
+    semaphore = asyncio.Semaphore(max(1, get_settings().max_concurrent_files))
+    services = {}
+    manifest = [{"filename": file.filename} for file in files]
+
+    async def run(index: int, file: UploadFile):
+        # Starlette has spooled each upload to disk; it is only read into memory once its
+        # turn comes, so at most max_concurrent_files are held at a time
+        async with semaphore:
+            try:
+                content = await file.read()
+                return index, await process_content_through_pipeline(file.filename, content, plan, services=services), None
+            except Exception as e:
+                return index, None, str(e)
+
+    tasks = [asyncio.create_task(run(index, file)) for index, file in enumerate(files)]
+    writer = ZipStreamWriter()
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            index, result, error = await next_result
+            entry = manifest[index]
+            if error is not None:
+                entry["error"] = error
+                continue
+            stem = Path(safe_filename(entry["filename"])).stem
+            if result["docx"] is not None:
+                entry["output"] = f"{index:04d}-{stem}.docx"
+                data = result["docx"]
+            else:
+                entry["output"] = f"{index:04d}-{stem}.md"
+                data = result["content"]
+            entry["metadata"] = result["metadata"]
+            yield writer.add(entry["output"], data)
+        yield writer.add("manifest.json", json.dumps({"files": manifest}, indent=2))
+        yield writer.close()
+    finally:
+        # The client went away (or something failed): don't keep filling files nobody will get
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+def safe_filename(filename: str) -> str:
+    # Upload names are client-controlled; keep only the final path component
+    return Path(filename.replace("\\", "/")).name or "document"
+
+async def run_pipeline(uploads: List[Tuple[str, bytes]], plan: PipelinePlan, progress=None):
+    semaphore = asyncio.Semaphore(max(1, get_settings().max_concurrent_files))
+    services = {}
+    has_output = any(step.type == 'DOCUMENT_OUTPUT' for step in plan.steps)
+
+    async def run(filename: str, content: bytes):
+        async with semaphore:
+            if progress:
+                progress({"stage": "file_started", "file": filename})
+            result = await process_content_through_pipeline(filename, content, plan, progress, services)
+            if progress:
+                progress({"stage": "file_completed", "file": filename})
+
+        # The JSON response keeps its original shape: base64 DOCX plus the text in two places.
+        # /api/pipeline/execute/stream returns each output once, as binary.
+        metadata = result["metadata"]
+        if has_output:
+            metadata["output_content"] = result["content"]
+        if result["docx"]:
+            metadata["docx_content"] = base64.b64encode(result["docx"]).decode('utf-8')
+
+        return {
+            "filename": filename,
+            "content": result["content"],
+            "metadata": metadata
+        }
+
+    # Files are independent, so fan them out; gather keeps results in upload order
+    results = await asyncio.gather(*(run(filename, content) for filename, content in uploads))
+        
+    return {"results": list(results)}
+
+async def process_content_through_pipeline(filename: str, current_content: bytes, plan: PipelinePlan, progress=None, services: dict = None):
     try:
-        current_content = await file.read()
         metadata = {
-            "filename": file.filename,
+            "filename": filename,
             "original_size": len(current_content),
             "output_format": "markdown"  # Default format
         }
         
         # Convert DOCX to markdown immediately if it's a DOCX file
         original_docx = None
-        if file.filename.endswith('.docx'):
+        source_markdown = None
+        output_docx = None
+        output_text = None
+        if filename.endswith('.docx'):
             original_docx = current_content  # Keep original for later conversion
-            converter = DocumentConverter()
-            current_content = converter.docx_to_markdown(current_content)
-            print(f"[process_file] Converted DOCX to markdown: {len(current_content)} characters")
-            print(f"[process_file] First 200 chars: {current_content[:200]}")
-        
-        for block in blocks:
-            if block['type'] == 'DOCUMENT_INPUT':
+            current_content = await get_conversion_pool().docx_to_markdown(current_content)
+            source_markdown = current_content
+            logger.debug("Converted %s to markdown: %d characters", filename, len(current_content))
+        elif isinstance(current_content, bytes):
+            current_content = current_content.decode('utf-8', errors='ignore')
+
+        # Services are shared by every block (and every file, when the caller passes them in)
+        services = services if services is not None else {}
+        outputs = {}
+        completed = 0
+        # For DOCX inputs, the value of each source blank in every step's output, while known
+        occurrences = OccurrenceValues(source_markdown) if source_markdown is not None else None
+        occurrence_values = {}
+
+        def openai_service(use_cache: bool) -> OpenAIService:
+            if use_cache not in services:
+                services[use_cache] = OpenAIService(use_cache=use_cache)
+            return services[use_cache]
+
+        async def run_step(step: PipelineStep):
+            nonlocal output_docx, output_text
+            document = current_content if step.document_source is None else outputs.get(step.document_source, "")
+            if occurrences is not None:
+                document_values = (occurrences.initial() if step.document_source is None
+                                   else occurrence_values.get(step.document_source))
+                occurrence_values[step.id] = document_values
+
+            if step.type == 'DOCUMENT_INPUT':
                 metadata['input_type'] = 'document'
+                return current_content
                 
-            elif block['type'] == 'TEXT_INPUT':
-                if isinstance(current_content, bytes):
-                    current_content = current_content.decode('utf-8', errors='ignore')
+            elif step.type == 'TEXT_INPUT':
                 metadata['input_type'] = 'text'
+                return step.config.get('text', '')
                 
-            elif block['type'] == 'BLANK_FINDER':
-                if isinstance(current_content, bytes):
-                    current_content = current_content.decode('utf-8', errors='ignore')
-                finder = DocumentConverter()
-                blanks = finder.find_blanks(current_content)
+            elif step.type == 'BLANK_FINDER':
+                blanks = DocumentConverter.find_blanks(document)
                 metadata['blanks_found'] = blanks
-                print(f"[process_file] Found blanks: {blanks}")
-                
-            elif block['type'] == 'GPT_MODEL':
-                # Get context from connected TEXT_INPUT nodes
-                context = ""
-                for input_conn in block['config'].get('inputs', []):
-                    if input_conn['targetInput'] == 'context':
-                        source_node_id = input_conn['sourceId']
-                        # Find the source node's text in the pipeline config
-                        for node in blocks:
-                            if node['id'] == source_node_id:
-                                context = node['config'].get('text', '')
-                                break
-                
-                print(f"[process_file] Using context: {context}")
+                logger.debug("Found %d blanks in %s", len(blanks), filename)
+                return document
                 
+            elif step.type == 'GPT_MODEL':
                 # Use OpenAI to fill blanks
-                openai_service = OpenAIService()
-                current_content = openai_service.fill_blanks(
-                    current_content,
-                    context,
+                filled, filled_values = await openai_service(step.config.get('use_cache', True)).fill_occurrences_async(
+                    document,
+                    step.context,
                     batch_size=15
                 )
+                if occurrences is not None:
+                    occurrence_values[step.id] = occurrences.carry(document_values, document, filled_values)
+                return filled
                 
-            elif block['type'] == 'TEMPLATE_MODEL':
-                if isinstance(current_content, bytes):
-                    current_content = current_content.decode('utf-8', errors='ignore')
-                template_values = block['config'].get('template_values', {})
-                for key, value in template_values.items():
-                    current_content = current_content.replace(f"[{key}]", value)
+            elif step.type == 'TEMPLATE_MODEL':
+                template_values = step.config.get('template_values', {})
+                # Exact [key] matches as before, plus blanks whose names match a key loosely
+                resolved, _ = ContextResolver(template_values, get_settings().prefill_fuzzy_cutoff).resolve(
+                    get_blank_detector().unique_blanks(document)
+                )
+                replacements = {**resolved, **{f"[{key}]": value for key, value in template_values.items()}}
+                filled = substitute(document, replacements)
+                if occurrences is not None:
+                    # Known per occurrence only when every replacement landed on a detected blank
+                    index = BlankIndex.build(document)
+                    filled_values = {o.id: replacements[o.text] for o in index.occurrences if o.text in replacements}
+                    occurrence_values[step.id] = occurrences.carry(
+                        document_values, document, filled_values if index.splice(filled_values) == filled else None
+                    )
+                return filled
                     
-            elif block['type'] == 'DOCUMENT_OUTPUT':
-                print("[process_file] Processing DOCUMENT_OUTPUT block")
-                if isinstance(current_content, bytes):
-                    current_content = current_content.decode('utf-8', errors='ignore')
-                
-                print(f"[process_file] Current content type: {type(current_content)}")
-                print(f"[process_file] Current content preview: {current_content[:200]}")
-                
+            elif step.type == 'DOCUMENT_OUTPUT':
                 # Convert back to DOCX if original was DOCX
                 if original_docx is not None:
-                    print("[process_file] Converting back to DOCX")
-                    converter = DocumentConverter()
-                    docx_content = converter.markdown_to_docx(current_content)
-                    metadata['docx_content'] = docx_content
+                    # Write the filled values into the original package when only blanks changed,
+                    # keeping its formatting; rebuild from markdown otherwise
+                    if document_values is not None and occurrences.text(document_values) == document:
+                        values = document_values
+                    else:
+                        values = recover_values(source_markdown, document)
+                    # None when the values can't be traced to the package's paragraphs
+                    filled_docx = (await get_conversion_pool().fill_docx(original_docx, values)
+                                   if values is not None else None)
+                    if filled_docx is not None:
+                        output_docx = filled_docx
+                        metadata['docx_mode'] = 'in_place'
+                    else:
+                        output_docx = await get_conversion_pool().markdown_to_docx(document)
+                        metadata['docx_mode'] = 'rebuilt'
                     metadata['output_format'] = 'docx'
-                    print("[process_file] DOCX conversion complete")
                 
-                metadata['output_content'] = current_content
+                output_text = document
+                return document
+
+        async def timed_step(step: PipelineStep):
+            with PIPELINE_BLOCK_SECONDS.time(block=step.type):
+                return await run_step(step)
+
+        # Steps on the same level only depend on earlier levels, so they can run concurrently
+        final_content = current_content
+        for level in plan.levels:
+            results = await asyncio.gather(*(timed_step(step) for step in level))
+            for step, result in zip(level, results):
+                outputs[step.id] = result
+                completed += 1
+                if step.type in DOCUMENT_PRODUCERS:
+                    final_content = result
+                if progress:
+                    progress({
+                        "stage": "block_completed",
+                        "file": filename,
+                        "block": step.type,
+                        "block_id": step.id,
+                        "index": completed - 1,
+                        "total": len(plan.steps)
+                    })
                 
+        # The output exists once: as text in content and, for DOCX inputs, as bytes in docx
         return {
-            "content": current_content,
+            "content": output_text if output_text is not None else final_content,
+            "docx": output_docx,
             "metadata": metadata
         }
         
-    except Exception as e:
-        print(f"Error processing file {file.filename}: {str(e)}")
+    except Exception:
+        logger.exception("Error processing file %s", filename)
         raise
 
 @app.post("/download-docx")
@@ -205,12 +450,10 @@ async def download_docx(content: dict):
     try:
         # Check if we received base64 encoded content
         if content.get('isBase64'):
-            import base64
             docx_content = base64.b64decode(content['content'])
         else:
             # Convert markdown to DOCX
-            converter = DocumentConverter()
-            docx_content = converter.markdown_to_docx(content['content'])
+            docx_content = await get_conversion_pool().markdown_to_docx(content['content'])
         
         # Return the content directly as a response with appropriate headers
         return Response(
@@ -221,59 +464,168 @@ async def download_docx(content: dict):
             }
         )
     except Exception as e:
-        print(f"Download error: {str(e)}")
+        logger.exception("Download failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/save-pipeline")
 async def save_pipeline(pipeline: dict):
     try:
-        # Create pipelines directory if it doesn't exist
-        pipeline_dir = Path("saved_pipelines")
-        pipeline_dir.mkdir(exist_ok=True)
-        
-        # Save pipeline with timestamp
-        pipeline_name = pipeline.get('name', f'pipeline_{int(time.time())}')
-        file_path = pipeline_dir / f"{pipeline_name}.json"
-        
-        with open(file_path, 'w') as f:
-            json.dump(pipeline, f, indent=2)
-            
-        return {"message": f"Pipeline saved as {pipeline_name}"}
+        pipeline_name = pipeline.get('name') or f'pipeline_{int(time.time())}'
+        version = await asyncio.to_thread(get_pipeline_store().save, pipeline_name, pipeline)
+        return {"message": f"Pipeline saved as {pipeline_name}", "name": pipeline_name, "version": version}
     except Exception as e:
-        print(f"Save pipeline error: {str(e)}")
+        logger.exception("Saving pipeline failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/list-pipelines")
-async def list_pipelines():
+async def list_pipelines(offset: int = 0, limit: int = 50, q: Optional[str] = None):
     try:
-        pipeline_dir = Path("saved_pipelines")
-        pipeline_dir.mkdir(exist_ok=True)
-        
-        pipelines = []
-        for file in pipeline_dir.glob("*.json"):
-            pipelines.append({
-                "name": file.stem,
-                "file": file.name,
-                "modified": os.path.getmtime(file)
-            })
-            
-        return {"pipelines": sorted(pipelines, key=lambda x: x['modified'], reverse=True)}
+        limit = max(1, min(limit, 500))
+        pipelines, total = await asyncio.to_thread(get_pipeline_store().list, offset, limit, q)
+        return {"pipelines": pipelines, "total": total, "offset": offset, "limit": limit}
     except Exception as e:
-        print(f"List pipelines error: {str(e)}")
+        logger.exception("Listing pipelines failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/load-pipeline/{name}")
-async def load_pipeline(name: str):
+async def load_pipeline(name: str, version: Optional[int] = None):
+    stored = await asyncio.to_thread(get_pipeline_store().get, name, version)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Pipeline not found")
+    return stored.config
+
+@app.get("/pipeline-versions/{name}")
+async def pipeline_versions(name: str):
+    versions = await asyncio.to_thread(get_pipeline_store().versions, name)
+    if not versions:
+        raise HTTPException(status_code=404, detail="Pipeline not found")
+    return {"name": name, "versions": versions}
+
+
+async def convert_and_fill_job(params: dict, inputs: List[Tuple[str, bytes]], progress):
+    request_obj = DocumentFillRequest(**params['request'])
+    filled_document = await fill_document(inputs[0][1], request_obj, progress)
+    return {"filled_document": filled_document}
+
+async def pipeline_job(params: dict, inputs: List[Tuple[str, bytes]], progress):
+    return await run_pipeline(inputs, await asyncio.to_thread(get_pipeline_plan, params['config']), progress)
+
+async def mail_merge_job(params: dict, inputs: List[Tuple[str, bytes]], progress):
+    request_obj = DocumentFillRequest(**params['request'])
+    (_, template), (rows_filename, rows_content) = inputs
+    # Rows already written by an interrupted run are kept in the job directory and skipped
+    merge = MailMerge(OpenAIService(use_cache=request_obj.use_cache))
+    return await merge.run(
+        template,
+        parse_rows(rows_content, rows_filename),
+        get_job_queue().store.output_dir(current_job_id.get()),
+        request_obj.context,
+        request_obj.example,
+        progress
+    )
+
+async def submit_job(kind: str, params: dict, uploads: List[Tuple[str, bytes]]):
     try:
-        file_path = Path("saved_pipelines") / f"{name}.json"
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="Pipeline not found")
-            
-        with open(file_path, 'r') as f:
-            pipeline = json.load(f)
-            
-        return pipeline
-    except Exception as e:
-        print(f"Load pipeline error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
- 
\ No newline at end of file
+        job = await get_job_queue().submit(kind, params, uploads)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job['id'], "status": job['status']}
+
+@app.post("/api/jobs/convert-and-fill")
+async def submit_convert_and_fill_job(
+    file: UploadFile = File(...),
+    request: str = Form(...)
+):
+    try:
+        request_data = json.loads(request)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON in request field")
+    DocumentFillRequest(**request_data)  # Validate before queueing
+    if not file.filename.endswith('.docx'):
+        raise HTTPException(status_code=400, detail="Only .docx files are supported")
+    return await submit_job("convert_and_fill", {"request": request_data}, [(file.filename, await file.read())])
+
+@app.post("/api/jobs/pipeline")
+async def submit_pipeline_job(
+    files: List[UploadFile] = File(...),
+    pipeline_config: str = Form(...)
+):
+    try:
+        config = json.loads(pipeline_config)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON in pipeline_config field")
+    try:
+        await asyncio.to_thread(get_pipeline_plan, config)  # Reject invalid graphs before queueing
+    except PipelineCompileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    uploads = [(file.filename, await file.read()) for file in files]
+    return await submit_job("pipeline", {"config": config}, uploads)
+
+@app.post("/api/mail-merge")
+async def submit_mail_merge_job(
+    template: UploadFile = File(...),
+    rows: UploadFile = File(...),
+    request: str = Form(...)
+):
+    """Queues one fill of the template per row; download the result from /api/jobs/{id}/archive."""
+    try:
+        request_data = json.loads(request)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON in request field")
+    DocumentFillRequest(**request_data)  # Validate before queueing
+    if not template.filename.endswith('.docx'):
+        raise HTTPException(status_code=400, detail="Only .docx templates are supported")
+    rows_content = await rows.read()
+    try:
+        row_count = len(parse_rows(rows_content, rows.filename))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid rows file: {e}")
+    response = await submit_job(
+        "mail_merge",
+        {"request": request_data},
+        [(template.filename, await template.read()), (rows.filename, rows_content)]
+    )
+    return {**response, "rows": row_count}
+
+def load_job_or_404(job_id: str) -> dict:
+    job = get_job_queue().store.load(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = load_job_or_404(job_id)
+    return {key: job[key] for key in ("id", "kind", "status", "progress", "error", "created_at", "updated_at")}
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = load_job_or_404(job_id)
+    if job['status'] == FAILED:
+        raise HTTPException(status_code=500, detail=job['error'])
+    if job['status'] != COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return get_job_queue().store.load_result(job_id)
+
+@app.get("/api/jobs/{job_id}/archive")
+async def get_job_archive(job_id: str):
+    job = load_job_or_404(job_id)
+    if job['kind'] != "mail_merge":
+        raise HTTPException(status_code=404, detail="Job has no archive")
+    if job['status'] == FAILED:
+        raise HTTPException(status_code=500, detail=job['error'])
+    if job['status'] != COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    store = get_job_queue().store
+    members = archive_members(store.output_dir(job_id), store.load_result(job_id)['rows'])
+    # Built while it is sent, one row file at a time (Starlette iterates it in a worker thread)
+    return StreamingResponse(
+        iter_zip(members),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="mail-merge-{job_id}.zip"'}
+    )
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    load_job_or_404(job_id)
+    return sse_response(get_job_queue().events(job_id))
@@ -5,6 +5,7 @@ class DocumentFillRequest(BaseModel):
     context: str
     example: Optional[str] = None
     batch_size: Optional[int] = 30  # Default to 3 pages per batch
+    use_cache: bool = True  # Set to False to force fresh completions
 
 class DocumentFillResponse(BaseModel):
     filled_document: str
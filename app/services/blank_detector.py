@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import re
+
+from .metrics import stage_timer
+
+# Named placeholder styles that can be enabled through the blank_patterns setting.
+# Any entry that is not one of these names is treated as a raw regular expression,
+# compiled on its own.
+BUILTIN_BLANK_PATTERNS: Dict[str, str] = {
+    "brackets": r'\[[^\[\]\n]+\]',      # [Name]
+    "underscores": r'_{3,}',            # ________
+    "braces": r'\{\{[^{}\n]+\}\}',      # {{name}}
+    "chevrons": r'<<[^<>\n]+>>',        # <<name>>
+    "dotted": r'\.{4,}|…{2,}',          # ........ or ……
+}
+
+
+@dataclass(frozen=True)
+class BlankMatch:
+    text: str
+    start: int
+    end: int
+    kind: str
+
+
+class BlankDetector:
+    """Finds placeholders locally: the built-in styles in one combined regex pass, plus
+    one pass per custom pattern.
+
+    Custom patterns are compiled on their own, so backreferences and inline flags such
+    as (?i) keep their meaning. Matches are merged as a single alternation would pick
+    them: leftmost first, ties going to the pattern listed first, never overlapping.
+    """
+
+    def __init__(self, patterns: Iterable[str] = ("brackets", "underscores")):
+        self.kinds: List[str] = []
+        self.custom: List[Tuple[int, re.Pattern]] = []
+        alternatives = []
+        for index, pattern in enumerate(patterns):
+            if pattern in BUILTIN_BLANK_PATTERNS:
+                self.kinds.append(pattern)
+                alternatives.append(f"(?P<_b{index}>{BUILTIN_BLANK_PATTERNS[pattern]})")
+            else:
+                self.kinds.append(f"custom_{index}")
+                # Fail early with the offending pattern in the traceback
+                self.custom.append((index, re.compile(pattern)))
+        self.regex = re.compile("|".join(alternatives)) if alternatives else None
+
+    def find(self, text: str) -> List[BlankMatch]:
+        if self.regex is None and not self.custom:
+            return []
+        with stage_timer("blank_detection"):
+            if self.custom:
+                matches = self._merged(text)
+            else:
+                matches = [(match, int(match.lastgroup[2:])) for match in self.regex.finditer(text)]
+            return [
+                BlankMatch(match.group(0), match.start(), match.end(), self.kinds[index])
+                for match, index in matches
+            ]
+
+    def _merged(self, text: str) -> List[Tuple[re.Match, int]]:
+        scanners = ([(self.regex, None)] if self.regex is not None else []) + [
+            (regex, index) for index, regex in self.custom
+        ]
+        pending = [self._search(regex, index, text, 0) for regex, index in scanners]
+        matches, pos = [], 0
+        while True:
+            found = [candidate for candidate in pending if candidate is not None]
+            if not found:
+                return matches
+            match, index = min(found, key=lambda candidate: (candidate[0].start(), candidate[1]))
+            matches.append((match, index))
+            pos = match.end()
+            # Scanners whose next match overlaps the one just taken look again past it
+            pending = [
+                candidate if candidate is not None and candidate[0].start() >= pos
+                else None if candidate is None else self._search(regex, fixed, text, pos)
+                for candidate, (regex, fixed) in zip(pending, scanners)
+            ]
+
+    @staticmethod
+    def _search(regex: re.Pattern, index: Optional[int], text: str, pos: int) -> Optional[Tuple[re.Match, int]]:
+        match = regex.search(text, pos)
+        # An empty match is never a placeholder
+        while match is not None and match.end() == match.start():
+            match = regex.search(text, match.start() + 1) if match.start() < len(text) else None
+        if match is None:
+            return None
+        return match, index if index is not None else int(match.lastgroup[2:])
+
+    def find_blanks(self, text: str) -> List[str]:
+        """Every placeholder occurrence, in document order."""
+        return [match.text for match in self.find(text)]
+
+    def unique_blanks(self, text: str) -> List[str]:
+        """Distinct placeholders in order of first appearance."""
+        return list(dict.fromkeys(self.find_blanks(text)))
+
+
+@lru_cache(maxsize=32)
+def _cached_detector(patterns: Tuple[str, ...]) -> BlankDetector:
+    return BlankDetector(patterns)
+
+
+def get_blank_detector(patterns: Iterable[str] = None) -> BlankDetector:
+    if patterns is None:
+        from ..config import get_settings
+        patterns = get_settings().blank_patterns
+    return _cached_detector(tuple(patterns))
@@ -0,0 +1,143 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Tuple
+import re
+
+from .blank_detector import BlankDetector, BlankMatch, get_blank_detector
+from .document_chunker import HEADING_PATTERN, DocumentChunker
+from .metrics import stage_timer
+from .substitution import fill_text
+
+HEADING_LINE = re.compile(HEADING_PATTERN.pattern, re.MULTILINE)
+# How an occurrence is marked inside its own window, e.g. "born on ⟦3⟧ in Rome"
+MARKER = "⟦{}⟧"
+
+
+@dataclass(frozen=True)
+class BlankOccurrence:
+    id: int
+    text: str
+    start: int
+    end: int
+    kind: str
+    section: str
+    window: str
+
+
+class BlankIndex:
+    """Every blank occurrence in a document with its span, section and surrounding text.
+
+    Identical placeholders (several ________, or [Date] in two places) are separate
+    occurrences with their own IDs, so each can get its own value; splice() then
+    writes all values back in one pass by offset.
+    """
+
+    def __init__(self, text: str, occurrences: List[BlankOccurrence], title: str = ""):
+        self.text = text
+        self.occurrences = occurrences
+        self.title = title
+        self.by_id = {occurrence.id: occurrence for occurrence in occurrences}
+
+    @classmethod
+    def build(cls, text: str, detector: BlankDetector = None, window_chars: int = 300) -> "BlankIndex":
+        return cls._from_matches(text, (detector or get_blank_detector()).find(text), window_chars)
+
+    @classmethod
+    def from_strings(cls, text: str, blanks: Iterable[str], window_chars: int = 300) -> "BlankIndex":
+        """Index of the occurrences of blanks named elsewhere, e.g. by the model's identification pass."""
+        ordered = sorted({blank for blank in blanks if blank}, key=len, reverse=True)
+        if not ordered:
+            return cls(text, [])
+        regex = re.compile("|".join(re.escape(blank) for blank in ordered))
+        matches = [BlankMatch(m.group(0), m.start(), m.end(), "identified") for m in regex.finditer(text)]
+        return cls._from_matches(text, matches, window_chars)
+
+    @classmethod
+    def _from_matches(cls, text: str, matches: List[BlankMatch], window_chars: int) -> "BlankIndex":
+        # Heading trail in effect at each heading's offset, for looking up a blank's section
+        positions: List[int] = []
+        trails: List[str] = []
+        trail: List[str] = []
+        title = ""
+        for heading in HEADING_LINE.finditer(text):
+            level = len(heading.group(1))
+            trail = trail[:level - 1] + [heading.group(2).strip()]
+            title = title or trail[-1]
+            positions.append(heading.start())
+            trails.append(" > ".join(trail))
+
+        occurrences = []
+        for number, match in enumerate(matches, 1):
+            slot = bisect_right(positions, match.start) - 1
+            section = trails[slot] if slot >= 0 else ""
+            occurrences.append(BlankOccurrence(
+                number, match.text, match.start, match.end, match.kind, section,
+                cls._window(text, match, number, window_chars)
+            ))
+        return cls(text, occurrences, title)
+
+    @staticmethod
+    def _window(text: str, match: BlankMatch, number: int, window_chars: int) -> str:
+        before_start = max(0, match.start - window_chars)
+        after_end = min(len(text), match.end + window_chars)
+        before = text[before_start:match.start]
+        after = text[match.end:after_end]
+        # Don't start or end mid-word
+        if before_start > 0 and " " in before:
+            before = before[before.index(" ") + 1:]
+        if after_end < len(text) and " " in after:
+            after = after[:after.rindex(" ")]
+        return (before + MARKER.format(number) + after).strip()
+
+    def sections(self) -> List[Tuple[str, List[BlankOccurrence]]]:
+        """Occurrences grouped by section, in document order."""
+        groups: List[Tuple[str, List[BlankOccurrence]]] = []
+        for occurrence in self.occurrences:
+            if groups and groups[-1][0] == occurrence.section:
+                groups[-1][1].append(occurrence)
+            else:
+                groups.append((occurrence.section, [occurrence]))
+        return groups
+
+    def batches(self, max_blanks: int, max_tokens: int) -> List[List[BlankOccurrence]]:
+        """Occurrences packed into fill requests of up to max_blanks, sized by their windows.
+
+        Small sections share a batch; a section that doesn't fit in what's left of the
+        current batch starts a new one, and one larger than a batch is split.
+        """
+        max_blanks = max(1, max_blanks or 1)
+        batches: List[List[BlankOccurrence]] = []
+        current: List[BlankOccurrence] = []
+        current_tokens = 0
+        for _, occurrences in self.sections():
+            if current and len(current) + len(occurrences) > max_blanks:
+                batches.append(current)
+                current, current_tokens = [], 0
+            for occurrence in occurrences:
+                tokens = DocumentChunker.estimate_tokens(occurrence.window)
+                if current and (len(current) >= max_blanks or current_tokens + tokens > max_tokens):
+                    batches.append(current)
+                    current, current_tokens = [], 0
+                current.append(occurrence)
+                current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def splice(self, values: Dict[int, Any]) -> str:
+        """The text with each valued occurrence replaced, built in a single left-to-right pass.
+
+        Occurrences without a usable value (missing, null, an object) keep their placeholder.
+        """
+        with stage_timer("substitution"):
+            pieces = []
+            cursor = 0
+            for occurrence in self.occurrences:
+                value = fill_text(values.get(occurrence.id))
+                if value is None:
+                    continue
+                pieces.append(self.text[cursor:occurrence.start])
+                pieces.append(value)
+                cursor = occurrence.end
+            pieces.append(self.text[cursor:])
+            return "".join(pieces)
@@ -0,0 +1,126 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from .metrics import record_cache_lookup
+
+
+class CompletionCache:
+    """Persistent LLM response cache keyed by a hash of the request, with TTL and LRU eviction."""
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl_seconds: int = 7 * 24 * 3600):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_last_access ON completions(last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_created_at ON completions(created_at)")
+        # Kept up to date by this process so a put never has to count the table
+        self._entries = self._count()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], response_format: Optional[Dict[str, Any]] = None) -> str:
+        payload = json.dumps([model, messages, response_format], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._entries -= self._conn.execute("DELETE FROM completions WHERE key = ?", (key,)).rowcount
+                row = None
+            if row is None:
+                self.misses += 1
+                record_cache_lookup("completion", False)
+                return None
+            self._conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            record_cache_lookup("completion", True)
+            return row[0]
+
+    def put(self, key: str, content: str):
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM completions WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, content, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, content, now, now)
+            )
+            self._entries += 0 if exists else 1
+            self._evict(now)
+
+    def _evict(self, now: float):
+        if self.ttl_seconds:
+            self._entries -= self._conn.execute(
+                "DELETE FROM completions WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+        if self._entries <= self.max_entries:
+            return
+        # Other workers sharing the file write to it too, so recount before trimming; trimming
+        # down to 90% keeps the recount to once per tenth of the cache filled
+        count = self._count()
+        overflow = count - (self.max_entries - self.max_entries // 10) if count > self.max_entries else 0
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+        self._entries = count - overflow
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._entries = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._count()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+@lru_cache()
+def get_completion_cache() -> Optional[CompletionCache]:
+    from ..config import get_settings
+    settings = get_settings()
+    if not settings.completion_cache_enabled:
+        return None
+    return CompletionCache(
+        settings.completion_cache_path,
+        max_entries=settings.completion_cache_max_entries,
+        ttl_seconds=settings.completion_cache_ttl_seconds
+    )
@@ -0,0 +1,115 @@
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Tuple
+import math
+import re
+import unicodedata
+
+from .document_cache import DocumentCache, content_digest
+from .document_chunker import DocumentChunker
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SENTENCE_BREAK = re.compile(r'(?<=[.!?;])\s+')
+TOKEN_PATTERN = re.compile(r'\w+')
+# Words too common to say anything about relevance, English and Italian
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it of on or that the this to was were will with
+il lo la i gli le un una di da del della dei delle in con su per tra fra e o che non al alla
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [token for token in TOKEN_PATTERN.findall(text) if token not in STOPWORDS and not token.startswith("_")]
+
+
+def split_passages(text: str, max_tokens: int) -> List[str]:
+    """Packs consecutive paragraphs into passages of up to max_tokens, splitting long ones by sentence."""
+    pieces = []
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if DocumentChunker.estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in SENTENCE_BREAK.split(paragraph):
+            # A single sentence longer than a passage is cut on word boundaries
+            words = sentence.split(" ")
+            while words:
+                taken, size = [], 0
+                while words and (not taken or size + len(words[0]) // 4 + 1 <= max_tokens):
+                    size += len(words[0]) // 4 + 1
+                    taken.append(words.pop(0))
+                pieces.append(" ".join(taken))
+
+    passages, current, current_tokens = [], [], 0
+    for piece in pieces:
+        tokens = DocumentChunker.estimate_tokens(piece)
+        if current and current_tokens + tokens > max_tokens:
+            passages.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        passages.append("\n\n".join(current))
+    return passages
+
+
+class ContextIndex:
+    """In-memory BM25 index over passages of a context, for picking what each prompt needs."""
+
+    def __init__(self, context: str, passage_tokens: int = 200, k1: float = 1.5, b: float = 0.75):
+        self.passages = split_passages(context, max(1, passage_tokens))
+        self.k1 = k1
+        self.b = b
+        # term -> [(passage index, term frequency)]
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths: List[int] = []
+        for index, passage in enumerate(self.passages):
+            counts = Counter(tokenize(passage))
+            self.lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings[term].append((index, frequency))
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        count = len(self.passages)
+        self.idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query: str, k: int) -> List[int]:
+        """Indexes of the k best-scoring passages, best first; passages sharing no term are left out."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, frequency in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / (self.average_length or 1))
+                scores[index] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return sorted(scores, key=lambda index: (-scores[index], index))[:k]
+
+    def select(self, query: str, k: int) -> str:
+        """The top-k passages for a query, in their original order so the text still reads naturally."""
+        hits = self.search(query, k) or list(range(min(k, len(self.passages))))
+        return "\n\n".join(self.passages[index] for index in sorted(hits))
+
+
+@lru_cache()
+def get_context_index_cache() -> DocumentCache:
+    from ..config import get_settings
+    return DocumentCache(get_settings().context_index_cache_entries, name="context_index")
+
+
+def get_context_index(context: str) -> ContextIndex:
+    """Index for a context, built once per distinct context (keyed by its SHA-256)."""
+    from ..config import get_settings
+    cache = get_context_index_cache()
+    digest = content_digest(context.encode("utf-8"))
+    index = cache.get(digest)
+    if index is None:
+        index = ContextIndex(context, get_settings().context_passage_tokens)
+        cache.put(digest, index)
+    return index
@@ -0,0 +1,132 @@
+from difflib import get_close_matches
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+import itertools
+import json
+import re
+import unicodedata
+
+from .substitution import fill_text
+
+# "Name: Jane", "- Date = 2024-03-15", "• Company: Example"
+KEY_VALUE_LINE = re.compile(r'^\s*(?:[-*•]\s*)?([^:=\n]{1,60}?)\s*[:=]\s*(\S.*?)\s*$')
+# Delimiters around a named placeholder: [Name], {{name}}, <<name>>
+PLACEHOLDER_DELIMITERS = re.compile(r'^(?:\[|\{\{|<<)\s*(.*?)\s*(?:\]|\}\}|>>)$', re.DOTALL)
+# Numbers in a key, which a close match must keep: "Phone 1" is not "Phone 2"
+DIGITS = re.compile(r'\d+')
+# Filler words dropped from keys so "Date of Birth" and "Birth date" meet
+STOPWORDS = frozenset({"the", "of", "a", "an", "for", "to", "di", "del", "della", "de", "la", "il", "le"})
+
+
+def normalize_key(text: str) -> str:
+    """Comparable form of a key or placeholder: no delimiters, accents, case or punctuation."""
+    match = PLACEHOLDER_DELIMITERS.match(text.strip())
+    if match:
+        text = match.group(1)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.sub(r'[^0-9a-z]+', " ", text.lower()).split())
+
+
+def _token_key(normalized: str) -> str:
+    tokens = [token for token in normalized.split() if token not in STOPWORDS]
+    return " ".join(sorted(tokens))
+
+
+def _flatten(data: Any, prefix: str = "", aliases: List[Tuple[str, Any]] = None) -> Iterable[Tuple[str, Any]]:
+    if isinstance(data, dict):
+        for key, value in data.items():
+            path = f"{prefix} {key}" if prefix else str(key)
+            if isinstance(value, dict):
+                yield from _flatten(value, path, aliases)
+            else:
+                yield path, value
+                if prefix and aliases is not None:
+                    aliases.append((str(key), value))  # The leaf name alone, for {"company": {"name": ...}}
+    elif isinstance(data, list) and prefix:
+        yield prefix, ", ".join(str(item) for item in data)
+
+
+def parse_structured_context(context: str) -> Dict[str, Any]:
+    """Key/value pairs found in context given as a JSON object or as "Key: value" lines."""
+    stripped = (context or "").strip()
+    if stripped.startswith("{"):
+        try:
+            data = json.loads(stripped)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            pairs, aliases = {}, []
+            # Full paths first, so a top-level "name" beats the alias of "company.name"
+            for key, value in itertools.chain(_flatten(data, "", aliases), aliases):
+                if isinstance(value, list):
+                    value = ", ".join(str(item) for item in value)
+                if value is not None and value != "":
+                    pairs.setdefault(key, value)
+            return pairs
+
+    pairs = {}
+    for line in stripped.splitlines():
+        match = KEY_VALUE_LINE.match(line)
+        if match:
+            pairs.setdefault(match.group(1), match.group(2))
+    return pairs
+
+
+class ContextResolver:
+    """Answers blanks straight from structured context, without a model call.
+
+    Keys are indexed three ways up front: normalized name, order-insensitive token
+    set, and the list of normalized names for a close-match fallback. A blank with no
+    name of its own (________) is never resolved here.
+    """
+
+    def __init__(self, pairs: Mapping[str, Any], fuzzy_cutoff: float = 0.85):
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.exact: Dict[str, Any] = {}
+        self.by_tokens: Dict[str, Any] = {}
+        for key, value in pairs.items():
+            normalized = normalize_key(str(key))
+            if not normalized:
+                continue
+            self.exact.setdefault(normalized, value)
+            self.by_tokens.setdefault(_token_key(normalized), value)
+        self.names = list(self.exact)
+
+    def lookup(self, blank: str):
+        normalized = normalize_key(blank)
+        if not normalized:
+            return None
+        if normalized in self.exact:
+            return self.exact[normalized]
+        token_key = _token_key(normalized)
+        if token_key in self.by_tokens:
+            return self.by_tokens[token_key]
+        if self.fuzzy_cutoff < 1:
+            close = get_close_matches(normalized, self.names, n=1, cutoff=self.fuzzy_cutoff)
+            # A spelling variant, not a numbered sibling: "Phone 1" never answers [Phone 2]
+            if close and DIGITS.findall(close[0]) == DIGITS.findall(normalized):
+                return self.exact[close[0]]
+        return None
+
+    def resolve(self, blanks: Iterable[str]) -> Tuple[Dict[str, Any], List[str]]:
+        """Splits blanks into those answered from context (with values) and those left for the model.
+
+        A value that can't be written into a document (true/false, null, an object) leaves
+        its blank to the model rather than counting it as answered.
+        """
+        resolved, unresolved = {}, []
+        for blank in blanks:
+            value = self.lookup(blank) if self.exact else None
+            if fill_text(value) is None:
+                unresolved.append(blank)
+            else:
+                resolved[blank] = value
+        return resolved, unresolved
+
+
+@lru_cache(maxsize=64)
+def get_context_resolver(context: str) -> ContextResolver:
+    """Resolver for a context string, parsed and indexed once per distinct context."""
+    from ..config import get_settings
+    return ContextResolver(parse_structured_context(context), get_settings().prefill_fuzzy_cutoff)
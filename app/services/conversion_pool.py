@@ -0,0 +1,100 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, List, Optional
+import asyncio
+import logging
+import multiprocessing
+import os
+
+from .document_converter import DocumentConverter
+from .document_cache import content_digest, get_document_cache
+from .docx_filler import fill_docx
+from .metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_worker():
+    # Pay for importing python-docx/lxml and loading the default template once per worker
+    from docx import Document
+    Document()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _docx_to_markdown(file_content: bytes) -> str:
+    return DocumentConverter._convert_docx(file_content)
+
+
+def _markdown_to_docx(markdown_text: str) -> bytes:
+    return DocumentConverter().markdown_to_docx(markdown_text)
+
+
+def _fill_docx(file_content: bytes, values: List[Any]) -> Optional[bytes]:
+    return fill_docx(file_content, values)
+
+
+class ConversionPool:
+    """Runs CPU-bound DOCX conversions in worker processes so the event loop stays free.
+
+    Arguments and results cross the process boundary as plain bytes/str, which pickle
+    without any copying beyond the pipe write. With workers=0 conversions run in a
+    thread instead, which still keeps the loop responsive but shares one core.
+    """
+
+    def __init__(self, workers: Optional[int] = None, start_method: str = "spawn"):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def start(self):
+        if self.workers <= 0 or self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=_warm_worker
+        )
+        # Spin every worker up now rather than on the first request
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _ping) for _ in range(self.workers)))
+        logger.info("Started %d conversion workers", self.workers)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, func, *args):
+        if self._executor is None:
+            return await asyncio.to_thread(func, *args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def docx_to_markdown(self, file_content: bytes) -> str:
+        # The document cache lives in this process, so check it before paying for a dispatch
+        cache = get_document_cache()
+        digest = content_digest(file_content)
+        markdown_text = cache.get(digest)
+        if markdown_text is None:
+            with stage_timer("conversion"):
+                markdown_text = await self._run(_docx_to_markdown, file_content)
+            cache.put(digest, markdown_text)
+        return markdown_text
+
+    async def markdown_to_docx(self, markdown_text: str) -> bytes:
+        with stage_timer("docx_rebuild"):
+            return await self._run(_markdown_to_docx, markdown_text)
+
+
+    async def fill_docx(self, file_content: bytes, values: List[Any]) -> Optional[bytes]:
+        with stage_timer("docx_fill"):
+            return await self._run(_fill_docx, file_content, values)
+
+
+@lru_cache()
+def get_conversion_pool() -> ConversionPool:
+    from ..config import get_settings
+    settings = get_settings()
+    return ConversionPool(settings.conversion_workers, settings.conversion_pool_start_method)
@@ -0,0 +1,67 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional
+import hashlib
+import threading
+
+from .metrics import record_cache_lookup
+
+
+def content_digest(file_content: bytes) -> str:
+    return hashlib.sha256(file_content).hexdigest()
+
+
+class DocumentCache:
+    """Bounded in-memory LRU of converted uploads, keyed by the SHA-256 of their bytes.
+
+    Also used for other values derived from content, under a different metrics name.
+    """
+
+    def __init__(self, max_entries: int = 128, name: str = "document"):
+        self.max_entries = max_entries
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(digest)
+            if value is None:
+                self.misses += 1
+                record_cache_lookup(self.name, False)
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            record_cache_lookup(self.name, True)
+            return value
+
+    def put(self, digest: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = value
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+@lru_cache()
+def get_document_cache() -> DocumentCache:
+    from ..config import get_settings
+    return DocumentCache(get_settings().document_cache_max_entries)
@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+from typing import List
+import re
+
+# Markdown produced by DocumentConverter separates blocks with a blank line
+BLOCK_SEPARATOR = "\n\n"
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*)')
+
+
+@dataclass
+class DocumentChunk:
+    index: int
+    text: str
+    token_estimate: int
+
+
+class DocumentChunker:
+    """Splits converted markdown into batches that can be filled independently."""
+
+    def __init__(self, max_blocks: int = 30, max_tokens: int = 3000):
+        self.max_blocks = max(1, max_blocks or 1)
+        self.max_tokens = max(1, max_tokens)
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        # Roughly four characters per token for English text; good enough for sizing
+        return len(text) // 4 + 1
+
+    def split(self, markdown_text: str) -> List[DocumentChunk]:
+        chunks: List[DocumentChunk] = []
+        current: List[str] = []
+        current_tokens = 0
+
+        def flush():
+            nonlocal current, current_tokens
+            if current:
+                chunks.append(DocumentChunk(len(chunks), BLOCK_SEPARATOR.join(current), current_tokens))
+            current = []
+            current_tokens = 0
+
+        for block in markdown_text.split(BLOCK_SEPARATOR):
+            block_tokens = self.estimate_tokens(block)
+            if current:
+                over_budget = (current_tokens + block_tokens > self.max_tokens
+                               or len(current) >= self.max_blocks)
+                # Prefer breaking right before a heading once the chunk is reasonably full
+                at_section_break = HEADING_PATTERN.match(block) is not None and current_tokens >= self.max_tokens // 2
+                if over_budget or at_section_break:
+                    flush()
+            current.append(block)
+            current_tokens += block_tokens
+
+        flush()
+        return chunks
@@ -1,99 +1,79 @@
 from docx import Document
 import markdown
 import re
-import tempfile
-import os
 import io
+from .blank_detector import get_blank_detector
+from .document_cache import content_digest, get_document_cache
+from .docx_extractor import FOOTER_END, FOOTER_START, HEADER_END, HEADER_START, extract_markdown
+from .metrics import stage_timer
 
 class DocumentConverter:
     @staticmethod
     def docx_to_markdown(file_content: bytes) -> str:
-        # Create a temporary file with .docx extension
-        with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as temp_file:
-            try:
-                # Write the content to the temp file
-                temp_file.write(file_content)
-                temp_file.flush()
-                
-                # Open the document with python-docx
-                doc = Document(temp_file.name)
-                
-                # Convert to markdown, preserving structure
-                markdown_content = []
-                
-                # Process paragraphs
-                for paragraph in doc.paragraphs:
-                    # Skip empty paragraphs
-                    if not paragraph.text.strip():
-                        continue
-                        
-                    # Handle different paragraph styles
-                    if paragraph.style.name.startswith('Heading'):
-                        # Add appropriate number of '#' for heading level
-                        level = int(paragraph.style.name[-1])
-                        markdown_content.append(f"{'#' * level} {paragraph.text}")
-                    else:
-                        markdown_content.append(paragraph.text)
-                
-                # Process tables if any
-                for table in doc.tables:
-                    rows = []
-                    for row in table.rows:
-                        cells = [cell.text for cell in row.cells]
-                        rows.append('| ' + ' | '.join(cells) + ' |')
-                    
-                    if rows:
-                        # Add header separator
-                        header_sep = '| ' + ' | '.join(['---'] * len(table.columns)) + ' |'
-                        rows.insert(1, header_sep)
-                        markdown_content.extend(rows)
-                
-                return "\n\n".join(markdown_content)
-                
-            finally:
-                # Clean up: close and remove the temporary file
-                temp_file.close()
-                os.unlink(temp_file.name)
+        # Identical uploads (re-runs of the same template) skip parsing entirely
+        cache = get_document_cache()
+        digest = content_digest(file_content)
+        markdown_text = cache.get(digest)
+        if markdown_text is None:
+            with stage_timer("conversion"):
+                markdown_text = DocumentConverter._convert_docx(file_content)
+            cache.put(digest, markdown_text)
+        return markdown_text
+
+    @staticmethod
+    def _convert_docx(file_content: bytes) -> str:
+        # One streaming pass over the package XML, in body order (see docx_extractor.py)
+        return extract_markdown(file_content)
     
     @staticmethod
     def find_blanks(markdown_text: str) -> list[str]:
-        # Find text within square brackets or sequences of underscores
-        blank_patterns = [
-            r'\[([^\]]+)\]',  # Text within square brackets
-            r'_{3,}',         # Three or more underscores
-        ]
-        
-        blanks = []
-        for pattern in blank_patterns:
-            matches = re.finditer(pattern, markdown_text)
-            for match in matches:
-                # For bracketed text, get the content within brackets
-                if '[' in pattern:
-                    blanks.append(match.group(0))  # Include the brackets
-                else:
-                    # For underscores, get the whole match
-                    blanks.append(match.group(0))
-        
-        return blanks
+        # Text within square brackets, runs of underscores and any extra configured styles,
+        # matched in a single pass and returned in document order
+        return get_blank_detector().find_blanks(markdown_text)
     
     def markdown_to_docx(self, markdown_text: str) -> bytes:
         doc = Document()
+        section = doc.sections[0]
+        # Blocks between the extractor's header/footer markers go back into the header/footer
+        targets = {HEADER_START: section.header, FOOTER_START: section.footer, HEADER_END: doc, FOOTER_END: doc}
+        target = doc
         
         # Split into paragraphs
         paragraphs = markdown_text.split('\n\n')
         
         for para_text in paragraphs:
-            if para_text.strip():
+            if para_text.strip() in targets:
+                target = targets[para_text.strip()]
+            elif para_text.strip():
                 # Handle headers
                 if para_text.startswith('#'):
                     level = len(para_text.split()[0])  # Count #'s
                     text = para_text.lstrip('#').strip()
-                    doc.add_heading(text, level=level)
-                else:
+                    if target is doc:
+                        doc.add_heading(text, level=level)
+                    else:
+                        self._add_story_paragraph(target, text, f"Heading {level}")
+                elif target is doc:
                     doc.add_paragraph(para_text)
+                else:
+                    self._add_story_paragraph(target, para_text)
         
         # Save to bytes
         docx_bytes = io.BytesIO()
         doc.save(docx_bytes)
         docx_bytes.seek(0)
-        return docx_bytes.read()
\ No newline at end of file
+        return docx_bytes.read()
+
+    @staticmethod
+    def _add_story_paragraph(story, text: str, style: str = None):
+        # First-page, even and default headers come out one after another; one copy is enough here
+        if any(existing.text == text for existing in story.paragraphs):
+            return
+        # A new header or footer starts with one empty paragraph; fill that before adding more
+        paragraph = story.paragraphs[0] if len(story.paragraphs) == 1 and not story.paragraphs[0].text else None
+        if paragraph is None:
+            story.add_paragraph(text, style)
+        else:
+            paragraph.text = text
+            if style:
+                paragraph.style = style
@@ -0,0 +1,320 @@
+"""Single-pass DOCX to markdown extraction straight from the package XML.
+
+word/document.xml is streamed with lxml iterparse and each top-level body element
+(paragraph, table or content control) is rendered and then discarded as soon as it
+ends, so memory is bounded by the largest element rather than the whole document.
+Blocks come out in body order, with tables in place and text boxes after the paragraph
+that anchors them. Header and footer text is kept out of the body: it comes first and
+last, between HEADER_START/HEADER_END and FOOTER_START/FOOTER_END marker comments, so
+a document rebuilt from the markdown can put it back where it came from. Every header
+and footer part is rendered, even when first-page, even and default ones repeat.
+
+Paragraph text matches python-docx's paragraph.text, and merged cells repeat their
+text across the grid like row.cells. Cell text is its paragraphs joined by newlines,
+as cell.text, except that nested tables and content controls inside a cell (which
+cell.text leaves out) are kept at their position, one line per nested row.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+import io
+import posixpath
+import re
+import zipfile
+
+from lxml import etree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+MC_NS = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+OFFICE_DOCUMENT_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+STYLES_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"
+HEADER_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/header"
+FOOTER_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/footer"
+
+
+def w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+BODY = w("body")
+P, TBL, TR, TC, SDT, SDT_CONTENT = w("p"), w("tbl"), w("tr"), w("tc"), w("sdt"), w("sdtContent")
+T, TAB, PTAB, BR, CR, NO_BREAK_HYPHEN = w("t"), w("tab"), w("ptab"), w("br"), w("cr"), w("noBreakHyphen")
+PPR, RPR, P_STYLE, TC_PR, GRID_SPAN, V_MERGE = w("pPr"), w("rPr"), w("pStyle"), w("tcPr"), w("gridSpan"), w("vMerge")
+TBL_GRID, GRID_COL, TXBX_CONTENT, VAL, TYPE = w("tblGrid"), w("gridCol"), w("txbxContent"), w("val"), w("type")
+# Alternate content repeats text boxes as a VML fallback; only the first choice is read
+MC_FALLBACK = f"{{{MC_NS}}}Fallback"
+MC_ALTERNATE_CONTENT = f"{{{MC_NS}}}AlternateContent"
+# Properties never hold document text, so their subtrees are not walked
+SKIPPED = (PPR, RPR, TC_PR, MC_FALLBACK)
+
+HEADER_START, HEADER_END = "<!-- header -->", "<!-- /header -->"
+FOOTER_START, FOOTER_END = "<!-- footer -->", "<!-- /footer -->"
+
+HEADING_LEVEL = re.compile(r'heading\s*(\d)$', re.IGNORECASE)
+
+
+def parser_options() -> dict:
+    # Uploaded XML is untrusted: no entity expansion, no network access
+    return {"resolve_entities": False, "no_network": True}
+
+
+def parse_part(package: zipfile.ZipFile, name: str) -> Optional[etree._Element]:
+    try:
+        data = package.read(name)
+    except KeyError:
+        return None
+    return etree.fromstring(data, etree.XMLParser(**parser_options()))
+
+
+def relationships(package: zipfile.ZipFile, part_name: str) -> List[Dict[str, str]]:
+    directory, filename = posixpath.split(part_name)
+    rels = parse_part(package, posixpath.join(directory, "_rels", f"{filename}.rels"))
+    if rels is None:
+        return []
+    return [
+        {
+            "type": rel.get("Type"),
+            "target": posixpath.normpath(posixpath.join(directory, rel.get("Target", ""))).lstrip("/"),
+        }
+        for rel in rels.iter(f"{{{PKG_REL_NS}}}Relationship")
+        if rel.get("TargetMode") != "External"
+    ]
+
+
+def _heading_styles(package: zipfile.ZipFile, styles_part: Optional[str]) -> Dict[str, int]:
+    """Heading level per paragraph style ID, from style names like "heading 2"."""
+    styles = parse_part(package, styles_part) if styles_part else None
+    if styles is None:
+        return {}
+    levels = {}
+    for style in styles.iter(w("style")):
+        name = style.find(w("name"))
+        match = HEADING_LEVEL.match(name.get(VAL, "")) if name is not None else None
+        if match:
+            levels[style.get(w("styleId"))] = int(match.group(1))
+    return levels
+
+
+@dataclass(frozen=True)
+class BlankSource:
+    """Where a blank of the markdown was rendered from: match `number` in paragraph `paragraph`
+    (its position in document order among the part's w:p elements) of `part`."""
+    part: str
+    paragraph: int
+    number: int
+    text: str
+
+
+class _Renderer:
+    def __init__(self, heading_styles: Dict[str, int], trace: List[Tuple[str, int, str]] = None):
+        self.heading_styles = heading_styles
+        # When tracing, (part, paragraph number, text) of every paragraph in output order
+        self.trace = trace
+        self._part = None
+        self._numbers: Dict[etree._Element, int] = {}
+
+    def enter(self, part_name: str, element: etree._Element, first: int = 0) -> int:
+        """Numbers the paragraphs of element from first, for tracing; returns how many it has."""
+        if self.trace is None:
+            return 0
+        self._part = part_name
+        self._numbers = {paragraph: first + index for index, paragraph in enumerate(element.iter(P))}
+        return len(self._numbers)
+
+    def _collect_text(self, element: etree._Element, parts: List[str], text_boxes: List[etree._Element]):
+        for child in element:
+            tag = child.tag
+            if tag == T:
+                parts.append(child.text or "")
+            elif tag in (TAB, PTAB):
+                parts.append("\t")
+            elif tag == BR:
+                parts.append("\n" if child.get(TYPE, "textWrapping") == "textWrapping" else "")
+            elif tag == CR:
+                parts.append("\n")
+            elif tag == NO_BREAK_HYPHEN:
+                parts.append("-")
+            elif tag == TXBX_CONTENT:
+                text_boxes.append(child)
+            elif tag not in SKIPPED:
+                self._collect_text(child, parts, text_boxes)
+
+    def paragraph_text(self, paragraph: etree._Element, text_boxes: List[etree._Element] = None) -> str:
+        parts: List[str] = []
+        self._collect_text(paragraph, parts, text_boxes if text_boxes is not None else [])
+        text = "".join(parts)
+        if self.trace is not None:
+            self.trace.append((self._part, self._numbers[paragraph], text))
+        return text
+
+    def blocks(self, element: etree._Element) -> Iterator[str]:
+        """Markdown blocks for one body-level element."""
+        if element.tag == P:
+            text_boxes: List[etree._Element] = []
+            text = self.paragraph_text(element, text_boxes)
+            if text.strip():
+                level = self._heading_level(element)
+                yield f"{'#' * level} {text}" if level else text
+            for text_box in text_boxes:
+                for child in text_box:
+                    yield from self.blocks(child)
+        elif element.tag == TBL:
+            yield from self._table_rows(element)
+        elif element.tag == SDT:
+            content = element.find(SDT_CONTENT)
+            if content is not None:
+                for child in content:
+                    yield from self.blocks(child)
+
+    def _heading_level(self, paragraph: etree._Element) -> int:
+        properties = paragraph.find(PPR)
+        style = properties.find(P_STYLE) if properties is not None else None
+        return self.heading_styles.get(style.get(VAL), 0) if style is not None else 0
+
+    def _cell_text(self, cell: etree._Element) -> str:
+        lines = []
+        for child in cell:
+            if child.tag == P:
+                lines.append(self.paragraph_text(child))
+            elif child.tag == TBL:
+                # Nested tables are flattened into the cell, one line per row
+                for row in child.iterchildren(TR):
+                    lines.append(" | ".join(self._cell_text(tc) for tc in row.iterchildren(TC)))
+            elif child.tag == SDT:
+                content = child.find(SDT_CONTENT)
+                if content is not None:
+                    lines.append(self._cell_text(content))
+        return "\n".join(lines)
+
+    def _table_rows(self, table: etree._Element) -> Iterator[str]:
+        grid = table.find(TBL_GRID)
+        column_count = len(grid.findall(GRID_COL)) if grid is not None else 0
+        # Text per grid column in the previous row, for vertical merges, with its traced paragraphs
+        above: Dict[int, Tuple[str, list]] = {}
+        rows = []
+        for row in table.iterchildren(TR):
+            cells, column = [], 0
+            for cell in row.iterchildren(TC):
+                properties = cell.find(TC_PR)
+                span, merge = 1, None
+                if properties is not None:
+                    span_element = properties.find(GRID_SPAN)
+                    if span_element is not None:
+                        span = int(span_element.get(VAL, "1"))
+                    merge_element = properties.find(V_MERGE)
+                    if merge_element is not None:
+                        merge = merge_element.get(VAL, "continue")
+                if merge == "continue":
+                    text, traced = above.get(column, ("", []))
+                    self._replay(traced)
+                else:
+                    start = len(self.trace) if self.trace is not None else 0
+                    text = self._cell_text(cell)
+                    traced = self.trace[start:] if self.trace is not None else []
+                for offset in range(span):
+                    if offset:
+                        self._replay(traced)  # A spanned cell shows its paragraphs once per grid column
+                    above[column + offset] = (text, traced)
+                    cells.append(text)
+                column += span
+            rows.append('| ' + ' | '.join(cells) + ' |')
+        if rows:
+            rows.insert(1, '| ' + ' | '.join(['---'] * column_count) + ' |')
+        yield from rows
+
+
+    def _replay(self, traced: list):
+        if self.trace is not None:
+            self.trace.extend(traced)
+
+
+def _iter_body_blocks(stream, renderer: _Renderer, part_name: str = None) -> Iterator[str]:
+    paragraphs = 0
+    for _, element in etree.iterparse(stream, events=("end",), **parser_options()):
+        parent = element.getparent()
+        if parent is None or parent.tag != BODY:
+            continue
+        paragraphs += renderer.enter(part_name, element, paragraphs)
+        yield from renderer.blocks(element)
+        # Drop everything parsed so far; only the current top-level element was ever needed
+        element.clear()
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def _part_blocks(package: zipfile.ZipFile, part_name: str, renderer: _Renderer) -> List[str]:
+    root = parse_part(package, part_name)
+    if root is None:
+        return []
+    renderer.enter(part_name, root)
+    return [block for child in root for block in renderer.blocks(child)]
+
+
+@dataclass
+class StoryParts:
+    """Package parts holding document text, in the order their text is extracted."""
+    headers: List[str]
+    document: str
+    footers: List[str]
+    styles: Optional[str]
+
+    @property
+    def all(self) -> List[str]:
+        return self.headers + [self.document] + self.footers
+
+
+def story_parts(package: zipfile.ZipFile) -> StoryParts:
+    document_part = next(
+        (rel["target"] for rel in relationships(package, "") if rel["type"] == OFFICE_DOCUMENT_REL),
+        "word/document.xml"
+    )
+    document_rels = relationships(package, document_part)
+
+    def targets(rel_type: str) -> List[str]:
+        return list(dict.fromkeys(rel["target"] for rel in document_rels if rel["type"] == rel_type))
+
+    styles = targets(STYLES_REL)
+    return StoryParts(targets(HEADER_REL), document_part, targets(FOOTER_REL), styles[0] if styles else None)
+
+
+def _render(package: zipfile.ZipFile, trace: List[Tuple[str, int, str]] = None) -> str:
+    parts = story_parts(package)
+    renderer = _Renderer(_heading_styles(package, parts.styles), trace)
+
+    def decorations(part_names: List[str], start: str, end: str) -> List[str]:
+        # First, even and default headers often repeat each other, but each part is kept:
+        # the in-place filler counts blanks per part, so the markdown must hold every one
+        blocks = []
+        for part_name in part_names:
+            blocks.extend(_part_blocks(package, part_name, renderer))
+        return [start] + blocks + [end] if blocks else []
+
+    markdown_content = decorations(parts.headers, HEADER_START, HEADER_END)
+    with package.open(parts.document) as stream:
+        markdown_content.extend(_iter_body_blocks(stream, renderer, parts.document))
+    markdown_content.extend(decorations(parts.footers, FOOTER_START, FOOTER_END))
+    return "\n\n".join(markdown_content)
+
+
+def extract_markdown(file_content: bytes) -> str:
+    with zipfile.ZipFile(io.BytesIO(file_content)) as package:
+        return _render(package)
+
+
+def blank_sources(package: zipfile.ZipFile, detector) -> Optional[List[BlankSource]]:
+    """The source of every blank the detector finds in the package's markdown, in order.
+
+    A merged cell shown in several grid columns, or rows, lists the same sources each
+    time it appears. None when the blanks found per paragraph differ from those found in
+    the markdown, e.g. a custom pattern matching across table cells.
+    """
+    trace: List[Tuple[str, int, str]] = []
+    markdown = _render(package, trace)
+    sources = [
+        BlankSource(part_name, paragraph, number, match.text)
+        for part_name, paragraph, text in trace
+        for number, match in enumerate(detector.find(text))
+    ]
+    if [source.text for source in sources] != [match.text for match in detector.find(markdown)]:
+        return None
+    return sources
@@ -0,0 +1,240 @@
+"""Format-preserving fill of the original DOCX package.
+
+Rather than rebuilding a document from markdown, filled values are spliced straight
+into the w:t nodes of the original paragraphs, so styles, tables, numbering, images
+and section layout survive untouched. A placeholder split across several runs keeps
+the first run's formatting; its text in the following runs is removed.
+
+Only the story parts that actually contain a replaced blank (document.xml and any
+header or footer) are re-serialized; every other part is copied across unchanged.
+"""
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import io
+import zipfile
+
+from lxml import etree
+
+from .blank_detector import BlankDetector, get_blank_detector
+from .docx_extractor import (
+    MC_ALTERNATE_CONTENT, MC_FALLBACK, P, T, TXBX_CONTENT, blank_sources, parse_part, story_parts
+)
+from .substitution import fill_text
+
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+
+class OccurrenceValues:
+    """The value of every blank occurrence in a source document, carried through fill steps.
+
+    A step's values are a list with one entry per blank the detector finds in the source
+    (None while still open). Each fill step reports values by occurrence number in its
+    own input, whose blanks are exactly the open entries, so values never have to be
+    worked out again from the text.
+    """
+
+    def __init__(self, source_markdown: str, detector: BlankDetector = None):
+        self.detector = detector or get_blank_detector()
+        self.source = source_markdown
+        self.matches = self.detector.find(source_markdown)
+
+    def initial(self) -> List[Optional[str]]:
+        return [None] * len(self.matches)
+
+    def carry(self, values: Optional[List[Optional[str]]], document: str,
+              filled: Optional[Dict[int, Any]]) -> Optional[List[Optional[str]]]:
+        """Values after a step filled blanks of document, given as {occurrence number: value}.
+
+        None when either side is unknown or the open occurrences don't line up with the
+        blanks in document, e.g. because an earlier value itself looks like a placeholder.
+        """
+        if values is None or filled is None:
+            return None
+        open_slots = [slot for slot, value in enumerate(values) if value is None]
+        found = [match.text for match in self.detector.find(document)]
+        if found != [self.matches[slot].text for slot in open_slots]:
+            return None
+        carried = list(values)
+        for number, value in filled.items():
+            text = fill_text(value)
+            if text is not None and 1 <= number <= len(open_slots):
+                carried[open_slots[number - 1]] = text
+        return carried
+
+    def text(self, values: List[Optional[str]]) -> str:
+        """The source with values in place, which a document must equal for values to describe it."""
+        pieces, cursor = [], 0
+        for match, value in zip(self.matches, values):
+            if value is not None:
+                pieces.append(self.source[cursor:match.start])
+                pieces.append(value)
+                cursor = match.end
+        pieces.append(self.source[cursor:])
+        return "".join(pieces)
+
+
+def recover_values(source_markdown: str, filled_markdown: str,
+                   detector: BlankDetector = None) -> Optional[List[str]]:
+    """The value of every blank occurrence, read off by aligning the filled text with its source.
+
+    Only a fallback for when values weren't carried through the fill steps (see
+    OccurrenceValues). Returns None when the text around the blanks was changed too, or
+    when the alignment is ambiguous ("[First] [Last]" filled as "John Paul Smith"); the
+    document can then only be rebuilt from markdown.
+    """
+    matches = (detector or get_blank_detector()).find(source_markdown)
+    if not matches:
+        return [] if source_markdown == filled_markdown else None
+    if not filled_markdown.startswith(source_markdown[:matches[0].start]):
+        return None
+
+    suffix = source_markdown[matches[-1].end:]
+    suffix_start = len(filled_markdown) - len(suffix)
+    if not filled_markdown.endswith(suffix) or suffix_start < matches[0].start:
+        return None
+
+    values: List[str] = []
+    position = matches[0].start
+    for index, match in enumerate(matches):
+        if index + 1 == len(matches):
+            value_end = suffix_start
+            if value_end < position:
+                return None
+        else:
+            literal = source_markdown[match.end:matches[index + 1].start]
+            value_end = filled_markdown.find(literal, position, suffix_start)
+            if value_end < 0:
+                return None
+            # The first occurrence of the literal was taken; any later one would split the values differently
+            if not literal or filled_markdown.find(literal, value_end + 1, suffix_start) >= 0:
+                return None
+        values.append(filled_markdown[position:value_end])
+        position = value_end + (len(literal) if index + 1 < len(matches) else 0)
+    return values
+
+
+def _splice(texts: List[str], replacements: List[Tuple[int, int, str]]) -> List[str]:
+    """Applies (start, end, value) replacements over the concatenation of texts in one linear pass.
+
+    Each value goes into the node where its blank starts; the rest of a blank that
+    spills into later nodes is cut out of them.
+    """
+    new_texts = []
+    node_start = 0
+    r = 0
+    for text in texts:
+        node_end = node_start + len(text)
+        pieces, cursor = [], node_start
+        while r < len(replacements):
+            start, end, value = replacements[r]
+            if start >= node_end:
+                break
+            if start >= cursor:
+                pieces.append(text[cursor - node_start:start - node_start])
+                pieces.append(value)
+            if end > node_end:
+                cursor = node_end
+                break
+            cursor = end
+            r += 1
+        pieces.append(text[cursor - node_start:])
+        new_texts.append("".join(pieces))
+        node_start = node_end
+    return new_texts
+
+
+def _text_nodes(paragraph: etree._Element, nodes: List[etree._Element]) -> List[etree._Element]:
+    # A text box paragraph is nested inside its anchor paragraph but filled on its own
+    for child in paragraph:
+        if child.tag == T:
+            nodes.append(child)
+        elif child.tag != TXBX_CONTENT:
+            _text_nodes(child, nodes)
+    return nodes
+
+
+class _Paragraph:
+    def __init__(self, element: etree._Element, detector: BlankDetector):
+        self.nodes = _text_nodes(element, [])
+        self.texts = [node.text or "" for node in self.nodes]
+        self.matches = detector.find("".join(self.texts))
+        # The VML copy of a text box repeats the primary one; fill it but don't count it
+        self.fallback = any(True for _ in element.iterancestors(MC_FALLBACK))
+        self.alternate = next(element.iterancestors(MC_ALTERNATE_CONTENT), None)
+
+
+def fill_docx(file_content: bytes, values: List[Any], detector: BlankDetector = None) -> Optional[bytes]:
+    """Writes per-occurrence values into the original package, or None if they can't be placed.
+
+    values has one entry per blank of the package's extracted markdown, in order (as
+    OccurrenceValues keeps them). Each entry goes to the paragraph and match that blank
+    was rendered from (see docx_extractor.blank_sources), so a header repeated across
+    parts gets each part's own value; a merged cell the markdown repeats takes the first
+    value given for it. A None value leaves that occurrence as it is. The VML fallback
+    copy of a text box gets the same values as the text box it repeats.
+
+    Returns None when the markdown's blanks can't be traced back to the package; the
+    document then has to be rebuilt from markdown instead.
+    """
+    detector = detector or get_blank_detector()
+    values = [fill_text(value) for value in values]
+
+    with zipfile.ZipFile(io.BytesIO(file_content)) as source:
+        sources = blank_sources(source, detector)
+        if sources is None or len(sources) != len(values):
+            return None
+        wanted: Dict[Tuple[str, int, int], Tuple[str, Optional[str]]] = {}
+        for blank, value in zip(sources, values):
+            key = (blank.part, blank.paragraph, blank.number)
+            if wanted.get(key, (None, None))[1] is None:
+                wanted[key] = (blank.text, value)
+        if not any(value is not None and value != text for text, value in wanted.values()):
+            return file_content
+
+        changed = {}
+        placed = 0
+        # Values given inside each mc:AlternateContent's primary choice, replayed for its fallback
+        chosen: Dict[Any, Dict[str, Deque[Optional[str]]]] = {}
+        for part_name in story_parts(source).all:
+            root = parse_part(source, part_name)
+            if root is None:
+                continue
+            replaced = False
+            for number, element in enumerate(root.iter(P)):
+                paragraph = _Paragraph(element, detector)
+                replacements = []
+                for index, match in enumerate(paragraph.matches):
+                    if paragraph.fallback:
+                        primary = chosen.get(paragraph.alternate, {}).get(match.text)
+                        value = primary.popleft() if primary else None
+                    else:
+                        found = wanted.get((part_name, number, index))
+                        if found is None:
+                            continue
+                        if found[0] != match.text:
+                            return None  # The paragraph reads differently from its markdown
+                        placed += 1
+                        value = found[1]
+                        if paragraph.alternate is not None:
+                            chosen.setdefault(paragraph.alternate, {}).setdefault(match.text, deque()).append(value)
+                    if value is not None and value != match.text:
+                        replacements.append((match.start, match.end, value))
+                if not replacements:
+                    continue
+                for node, old_text, new_text in zip(paragraph.nodes, paragraph.texts,
+                                                    _splice(paragraph.texts, replacements)):
+                    if new_text != old_text:
+                        node.text = new_text
+                        node.set(XML_SPACE, "preserve")
+                replaced = True
+            if replaced:
+                changed[part_name] = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+        if placed != len(wanted):
+            return None
+
+        output = io.BytesIO()
+        with zipfile.ZipFile(output, "w") as target:
+            for info in source.infolist():
+                # Same entry metadata and compression; only the rewritten parts get new content
+                target.writestr(info, changed.get(info.filename) or source.read(info.filename))
+    return output.getvalue()
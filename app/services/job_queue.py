@@ -0,0 +1,369 @@
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+from typing import IO, Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from .metrics import trace_id_var
+
+logger = logging.getLogger(__name__)
+
+# ID of the job a handler is running for, so it can keep files in the job's directory
+current_job_id: ContextVar[Optional[str]] = ContextVar("current_job_id", default=None)
+
+# Statuses a job moves through; only the last two are terminal
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+TERMINAL_STATUSES = (COMPLETED, FAILED)
+
+# How often directories of jobs past their retention period are looked for
+CLEANUP_INTERVAL = 3600.0
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+JobHandler = Callable[[Dict[str, Any], List[Tuple[str, bytes]], ProgressCallback], Awaitable[Any]]
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobStore:
+    """Keeps each job in its own directory so queued and running work survives a restart.
+
+    <root>/<job_id>/job.json      status, parameters and latest progress
+    <root>/<job_id>/inputs/       uploaded files
+    <root>/<job_id>/events.jsonl  every progress event, replayed to late subscribers
+    <root>/<job_id>/result.json   handler result once completed
+    <root>/<job_id>/outputs/      files written by the handler, kept across restarts
+    <root>/<job_id>/lock          flock()ed by whichever process is running the job
+    <root>/.unfinished/<job_id>   empty marker while the job is queued or running, so
+                                  recovery never has to read finished jobs
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._unfinished_dir = self.root / ".unfinished"
+        if not self._unfinished_dir.exists():
+            # Stores written before the index existed are scanned once to build it
+            self._unfinished_dir.mkdir(exist_ok=True)
+            for path in self.root.glob("*/job.json"):
+                with open(path) as f:
+                    job = json.load(f)
+                if job["status"] not in TERMINAL_STATUSES:
+                    (self._unfinished_dir / job["id"]).touch()
+
+    def _dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+    @staticmethod
+    def _write_json(path: Path, data: Any):
+        # Write-then-rename so a crash never leaves a half-written file behind
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def create(self, kind: str, params: Dict[str, Any], files: List[Tuple[str, bytes]]) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        inputs_dir = self._dir(job_id) / "inputs"
+        inputs_dir.mkdir(parents=True)
+        filenames = []
+        for index, (filename, content) in enumerate(files):
+            (inputs_dir / f"{index:04d}").write_bytes(content)
+            filenames.append(filename)
+        # Marked before job.json exists, so a queued job is never missing from the index
+        (self._unfinished_dir / job_id).touch()
+
+        now = time.time()
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "status": QUEUED,
+            "params": params,
+            "filenames": filenames,
+            "progress": None,
+            "error": None,
+            "trace_id": trace_id_var.get(),
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.save(job)
+        return job
+
+    def save(self, job: Dict[str, Any]):
+        job["updated_at"] = time.time()
+        self._write_json(self._dir(job["id"]) / "job.json", job)
+        if job["status"] in TERMINAL_STATUSES:
+            (self._unfinished_dir / job["id"]).unlink(missing_ok=True)
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        path = self._dir(job_id) / "job.json"
+        # Job IDs come from URLs; refuse anything that is not one of our directories
+        if not job_id.isalnum() or not path.exists():
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def load_inputs(self, job: Dict[str, Any]) -> List[Tuple[str, bytes]]:
+        inputs_dir = self._dir(job["id"]) / "inputs"
+        return [
+            (filename, (inputs_dir / f"{index:04d}").read_bytes())
+            for index, filename in enumerate(job["filenames"])
+        ]
+
+    def output_dir(self, job_id: str) -> Path:
+        path = self._dir(job_id) / "outputs"
+        path.mkdir(exist_ok=True)
+        return path
+
+    def append_event(self, job_id: str, event: Dict[str, Any]):
+        with open(self._dir(job_id) / "events.jsonl", 'a') as f:
+            f.write(json.dumps(event) + "\n")
+
+    def load_events(self, job_id: str) -> List[Dict[str, Any]]:
+        path = self._dir(job_id) / "events.jsonl"
+        if not path.exists():
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def save_result(self, job_id: str, result: Any):
+        self._write_json(self._dir(job_id) / "result.json", result)
+
+    def load_result(self, job_id: str) -> Any:
+        with open(self._dir(job_id) / "result.json") as f:
+            return json.load(f)
+
+    def claim(self, job_id: str) -> Optional[IO]:
+        """Takes the job's lock without waiting; None if another worker (in any process) holds it.
+
+        The OS drops the lock when its holder exits, so a job whose process died can be
+        claimed again straight away while a live run is never started twice.
+        """
+        lock_file = open(self._dir(job_id) / "lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    @staticmethod
+    def release(lock_file: IO):
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+    def is_claimed(self, job_id: str) -> bool:
+        lock_file = self.claim(job_id)
+        if lock_file is None:
+            return True
+        self.release(lock_file)
+        return False
+
+    def unfinished_jobs(self) -> List[Dict[str, Any]]:
+        jobs = []
+        for job_id in os.listdir(self._unfinished_dir):
+            job = self.load(job_id)
+            # None while create() is still writing the job
+            if job is not None and job["status"] not in TERMINAL_STATUSES:
+                jobs.append(job)
+        return sorted(jobs, key=lambda job: job["created_at"])
+
+    def remove_finished(self, older_than: float) -> int:
+        """Deletes the directories of jobs that finished more than older_than seconds ago."""
+        cutoff = time.time() - older_than
+        unfinished = set(os.listdir(self._unfinished_dir))
+        removed = 0
+        for path in self.root.iterdir():
+            if not path.name.isalnum() or path.name in unfinished:
+                continue
+            # job.json is last written when the job finishes; without one, create() crashed
+            state = path / "job.json"
+            try:
+                modified = (state if state.exists() else path).stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if modified < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+
+class JobQueue:
+    """Bounded asyncio worker pool that runs persisted jobs and fans out their progress events."""
+
+    def __init__(self, store: JobStore, workers: int = 2, max_queued: int = 100, recovery_interval: float = 30.0,
+                 retention: float = 7 * 24 * 3600):
+        self.store = store
+        self.worker_count = max(1, workers)
+        self.max_queued = max_queued
+        self.recovery_interval = recovery_interval
+        # Seconds finished jobs are kept for; 0 keeps them forever
+        self.retention = retention
+        self.handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._recovery: Optional[asyncio.Task] = None
+        # Jobs queued or running in this process, so recovery doesn't queue them twice
+        self._local: Set[str] = set()
+        # Subscribers wait on the current event; emitting sets it and swaps in a fresh one
+        self._signals: Dict[str, asyncio.Event] = {}
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+        # The backlog may be larger than the queue, so it is fed in by a task of its own
+        self._recovery = asyncio.create_task(self._recover())
+        logger.info("Started %d job workers", self.worker_count)
+
+    async def stop(self):
+        tasks = self._workers + ([self._recovery] if self._recovery else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._recovery = None
+        self._local.clear()
+
+    async def _recover(self):
+        """Queues unfinished jobs no live worker holds: at startup, then every recovery_interval.
+
+        This picks up work interrupted by a restart and jobs whose worker process died.
+        Finished jobs past their retention period are deleted along the way.
+        """
+        cleaned_at = 0.0
+        while True:
+            for job in await asyncio.to_thread(self.store.unfinished_jobs):
+                if job["id"] in self._local or await asyncio.to_thread(self.store.is_claimed, job["id"]):
+                    continue
+                logger.info("Re-queueing job %s (%s)", job['id'], job['status'])
+                self._local.add(job["id"])
+                await self._queue.put(job["id"])
+            if self.retention and time.time() - cleaned_at >= CLEANUP_INTERVAL:
+                cleaned_at = time.time()
+                removed = await asyncio.to_thread(self.store.remove_finished, self.retention)
+                if removed:
+                    logger.info("Removed %d finished jobs", removed)
+            await asyncio.sleep(self.recovery_interval)
+
+    async def submit(self, kind: str, params: Dict[str, Any], files: List[Tuple[str, bytes]]) -> Dict[str, Any]:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        if self._queue.full():
+            raise JobQueueFull("Too many queued jobs, try again later")
+        job = await asyncio.to_thread(self.store.create, kind, params, files)
+        try:
+            self._queue.put_nowait(job["id"])
+            self._local.add(job["id"])
+        except asyncio.QueueFull:
+            # Filled up while the uploads were written; the job is saved, so recovery queues it
+            logger.info("Job %s left for recovery, the queue is full", job['id'])
+        self._emit(job["id"], {"event": "queued"})
+        return job
+
+    def _emit(self, job_id: str, event: Dict[str, Any]):
+        event = {"time": time.time(), **event}
+        self.store.append_event(job_id, event)
+        signal = self._signals.pop(job_id, None)
+        if signal is not None:
+            signal.set()
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                lock_file = self.store.claim(job_id)
+                if lock_file is None:
+                    logger.debug("Job %s is being run by another worker", job_id)
+                    continue
+                try:
+                    await self._run(job_id)
+                finally:
+                    self.store.release(lock_file)
+            finally:
+                self._local.discard(job_id)
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        # Loaded only once claimed: another worker may have finished it in the meantime
+        job = self.store.load(job_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return
+
+        # Logs written while the job runs carry the trace ID of the request that submitted it
+        trace_id_var.set(job.get("trace_id"))
+        current_job_id.set(job_id)
+
+        def progress(event: Dict[str, Any]):
+            job["progress"] = event
+            self.store.save(job)
+            self._emit(job_id, {"event": "progress", **event})
+
+        job["status"] = RUNNING
+        self.store.save(job)
+        self._emit(job_id, {"event": "running"})
+        try:
+            inputs = await asyncio.to_thread(self.store.load_inputs, job)
+            result = await self.handlers[job["kind"]](job["params"], inputs, progress)
+            self.store.save_result(job_id, result)
+            job["status"] = COMPLETED
+            self.store.save(job)
+            self._emit(job_id, {"event": COMPLETED})
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            job["status"] = FAILED
+            job["error"] = str(e)
+            self.store.save(job)
+            self._emit(job_id, {"event": FAILED, "error": str(e)})
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Replays a job's events so far, then follows new ones until the job finishes."""
+        sent = 0
+        while True:
+            signal = self._signals.setdefault(job_id, asyncio.Event())
+            events = self.store.load_events(job_id)
+            for event in events[sent:]:
+                yield event
+            sent = len(events)
+
+            job = self.store.load(job_id)
+            if job is None:
+                return
+            if job["status"] in TERMINAL_STATUSES:
+                # The final event may have landed between reading the log and the status
+                for event in self.store.load_events(job_id)[sent:]:
+                    yield event
+                return
+            try:
+                # The timeout is a safety net in case the job is being run by another worker process
+                await asyncio.wait_for(signal.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                yield {"event": "heartbeat", "time": time.time()}
+
+
+@lru_cache()
+def get_job_queue() -> JobQueue:
+    from ..config import get_settings
+    settings = get_settings()
+    return JobQueue(
+        JobStore(settings.job_data_dir),
+        workers=settings.job_workers,
+        max_queued=settings.job_queue_max_size,
+        recovery_interval=settings.job_recovery_interval_seconds,
+        retention=settings.job_retention_seconds
+    )
@@ -0,0 +1,63 @@
+from typing import Any, List, Tuple
+import json
+import re
+
+_WHITESPACE = " \t\r\n"
+
+
+class ObjectMemberParser:
+    """Incrementally parses the members of one named JSON object out of a streamed reply.
+
+    Fed the completion text delta by delta, it returns each `"key": value` pair of
+    the object under `field` (e.g. {"filled_values": {...}}) as soon as the pair is
+    complete, without waiting for the rest of the document.
+    """
+
+    def __init__(self, field: str = "filled_values"):
+        self._start_pattern = re.compile(r'"' + re.escape(field) + r'"\s*:\s*\{')
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = None  # Index just inside the object once its opening brace has been seen
+        self.done = False
+
+    def feed(self, delta: str) -> List[Tuple[str, Any]]:
+        self._buffer += delta
+        if self._pos is None:
+            match = self._start_pattern.search(self._buffer)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        members = []
+        while not self.done:
+            member = self._next_member()
+            if member is None:
+                break
+            members.append(member)
+        return members
+
+    def _skip(self, pos: int, characters: str) -> int:
+        while pos < len(self._buffer) and self._buffer[pos] in characters:
+            pos += 1
+        return pos
+
+    def _next_member(self):
+        buffer = self._buffer
+        pos = self._skip(self._pos, _WHITESPACE + ",")
+        if pos < len(buffer) and buffer[pos] == "}":
+            self.done = True
+            return None
+        try:
+            key, pos = self._decoder.raw_decode(buffer, pos)
+            pos = self._skip(pos, _WHITESPACE)
+            if pos >= len(buffer) or buffer[pos] != ":":
+                return None
+            value, pos = self._decoder.raw_decode(buffer, self._skip(pos + 1, _WHITESPACE))
+        except json.JSONDecodeError:
+            return None  # The pair is still incomplete
+        # A number at the end of the buffer may still be growing; wait for its delimiter
+        end = self._skip(pos, _WHITESPACE)
+        if end >= len(buffer):
+            return None
+        self._pos = pos
+        return key, value
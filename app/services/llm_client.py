@@ -0,0 +1,219 @@
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+import contextlib
+import logging
+import random
+import threading
+import time
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from .metrics import LLM_REQUESTS, record_estimated_usage, record_usage, stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: throttling, transient network failures and server-side 5xx
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+class TokenBucket:
+    """Rate limiter refilled continuously at rate_per_minute, usable from threads and coroutines.
+
+    Callers reserve capacity up front and are told how long to wait; the bucket may go
+    into debt, which keeps large requests from starving behind small ones.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        if self.rate_per_second <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+            self.updated_at = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate_per_second)
+
+    def refund(self, amount: float):
+        """Give back (or with a negative amount, take more of) a reservation once the real cost is known."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    async def acquire(self, amount: float = 1):
+        wait = self.reserve(amount)
+        if wait:
+            await asyncio.sleep(wait)
+
+
+def estimate_prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    # ~4 characters per token plus a small per-message overhead
+    return sum(len(message.get("content") or "") // 4 + 4 for message in messages)
+
+
+class LLMClientManager:
+    """Process-wide async OpenAI client sharing one keep-alive connection pool.
+
+    Every completion goes through the requests-per-minute and tokens-per-minute buckets
+    and is retried with exponential backoff and full jitter on retryable errors, so a
+    burst of load turns into queueing instead of a burst of 429s.
+    """
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, requests_per_minute: int = 500,
+                 tokens_per_minute: int = 200000, expected_completion_tokens: int = 512,
+                 max_retries: int = 5, backoff_base_seconds: float = 0.5, backoff_max_seconds: float = 30.0,
+                 max_connections: int = 100, max_keepalive_connections: int = 20, timeout_seconds: float = 120.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.expected_completion_tokens = expected_completion_tokens
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self.timeout = httpx.Timeout(timeout_seconds, connect=10.0)
+        self._async_client: Optional[AsyncOpenAI] = None
+        self._async_loop = None
+
+    async def _get_async_client(self) -> AsyncOpenAI:
+        # httpx async pools are bound to the loop that opened them; rebuild if the loop changed
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            if self._async_client is not None:
+                try:
+                    await self._async_client.close()
+                except Exception as e:
+                    # Its connections belong to the old (often already closed) loop
+                    logger.debug("Closing the previous async LLM client failed: %s", e)
+            # Retries are ours, so the SDK's built-in retry loop is switched off
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0,
+                http_client=httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        delay = min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** attempt))
+        jittered = random.uniform(0, delay)
+        return max(jittered, retry_after) if retry_after is not None else jittered
+
+    def _settle(self, reserved_tokens: int, completion: Any):
+        LLM_REQUESTS.inc(outcome="success")
+        record_usage(completion)
+        usage = getattr(completion, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            self.token_bucket.refund(reserved_tokens - usage.total_tokens)
+
+    def _settle_estimated(self, reserved_tokens: int, prompt_tokens: int, completion_text_length: int):
+        """Accounting for a response that reported no usage: estimates, labelled as such."""
+        completion_tokens = completion_text_length // 4 + 1
+        LLM_REQUESTS.inc(outcome="success_no_usage")
+        record_estimated_usage(prompt_tokens, completion_tokens)
+        self.token_bucket.refund(reserved_tokens - prompt_tokens - completion_tokens)
+
+    async def _create(self, reserved_tokens: int, timed: bool, **kwargs) -> Any:
+        """chat.completions.create behind the rate limits, retried with backoff on retryable errors."""
+        for attempt in range(self.max_retries + 1):
+            await self.request_bucket.acquire(1)
+            await self.token_bucket.acquire(reserved_tokens)
+            try:
+                client = await self._get_async_client()
+                with stage_timer("llm_call") if timed else contextlib.nullcontext():
+                    return await client.chat.completions.create(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                LLM_REQUESTS.inc(outcome=type(e).__name__)
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning("%s from LLM API, retrying in %.2fs (attempt %d/%d)",
+                               type(e).__name__, delay, attempt + 1, self.max_retries)
+                await asyncio.sleep(delay)
+            except Exception as e:
+                LLM_REQUESTS.inc(outcome=type(e).__name__)
+                raise
+
+    async def complete_async(self, **kwargs) -> Any:
+        reserved = estimate_prompt_tokens(kwargs.get("messages", [])) + self.expected_completion_tokens
+        completion = await self._create(reserved, True, **kwargs)
+        self._settle(reserved, completion)
+        return completion
+
+    async def stream_async(self, **kwargs) -> AsyncIterator[str]:
+        """Yields the content deltas of a streamed completion.
+
+        Opening the stream is rate limited and retried like complete_async; once text
+        has been handed to the caller a failure is raised rather than retried, since the
+        caller may already have acted on the partial output. A stream that ends without
+        a usage chunk is accounted with estimated token counts.
+        """
+        prompt_tokens = estimate_prompt_tokens(kwargs.get("messages", []))
+        reserved = prompt_tokens + self.expected_completion_tokens
+        stream = await self._create(reserved, False, stream=True, stream_options={"include_usage": True}, **kwargs)
+
+        usage_chunk = None
+        streamed_length = 0
+        try:
+            with stage_timer("llm_call"):
+                async for chunk in stream:
+                    # With include_usage the final chunk carries usage and no choices
+                    if getattr(chunk, "usage", None) is not None:
+                        usage_chunk = chunk
+                    for choice in chunk.choices:
+                        if choice.delta and choice.delta.content:
+                            streamed_length += len(choice.delta.content)
+                            yield choice.delta.content
+        except Exception as e:
+            LLM_REQUESTS.inc(outcome=type(e).__name__)
+            raise
+        if usage_chunk is not None:
+            self._settle(reserved, usage_chunk)
+        else:
+            self._settle_estimated(reserved, prompt_tokens, streamed_length)
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+
+@lru_cache()
+def get_llm_client() -> LLMClientManager:
+    from ..config import get_settings
+    settings = get_settings()
+    return LLMClientManager(
+        api_key=settings.openai_api_key,
+        base_url=settings.openai_base_url,
+        requests_per_minute=settings.llm_requests_per_minute,
+        tokens_per_minute=settings.llm_tokens_per_minute,
+        expected_completion_tokens=settings.llm_expected_completion_tokens,
+        max_retries=settings.llm_max_retries,
+        backoff_base_seconds=settings.llm_backoff_base_seconds,
+        backoff_max_seconds=settings.llm_backoff_max_seconds,
+        max_connections=settings.llm_max_connections,
+        max_keepalive_connections=settings.llm_max_keepalive_connections,
+        timeout_seconds=settings.llm_request_timeout_seconds
+    )
@@ -0,0 +1,228 @@
+"""Bulk mail merge: one DOCX template filled once per row of a CSV or JSONL file.
+
+The template is converted and its blanks are detected once; rows are then packed
+several to a completion and filled concurrently. Every finished row is written to
+the output directory straight away, so an interrupted merge resumes from the rows
+that are still missing. A row the model doesn't answer in full is not written at all
+and is reported as failed, so the next run tries it again.
+
+    python -m app.services.mail_merge template.docx people.csv -o merged.zip --context "Company: Example"
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+
+from ..config import get_settings
+from .conversion_pool import ConversionPool, get_conversion_pool
+from .document_chunker import DocumentChunker
+from .openai_service import OpenAIService
+from .substitution import fill_text, substitute
+from .zip_stream import iter_zip
+
+logger = logging.getLogger(__name__)
+
+ROW_FILE_PATTERN = "row-{:05d}.docx"
+
+
+def parse_rows(data: bytes, filename: str) -> List[Dict[str, Any]]:
+    """Rows from a CSV file with a header line, or from JSONL with one object per line."""
+    text = data.decode("utf-8-sig")
+    if filename.endswith(".csv"):
+        return [dict(row) for row in csv.DictReader(io.StringIO(text))]
+    if filename.endswith((".jsonl", ".ndjson")):
+        rows = []
+        for number, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError(f"Line {number} of {filename} is not a JSON object")
+            rows.append(row)
+        return rows
+    raise ValueError("Rows must be a .csv or .jsonl file")
+
+
+def row_path(output_dir: Path, index: int) -> Path:
+    return output_dir / ROW_FILE_PATTERN.format(index + 1)
+
+
+async def gather_or_cancel(*coroutines) -> List[Any]:
+    """Like asyncio.gather, but cancels the other tasks as soon as one of them fails."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        # Let them unwind (temporary files, semaphores) before the error propagates
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+@dataclass
+class MergeTemplate:
+    markdown: str
+    blanks: List[str]
+
+
+class MailMerge:
+    def __init__(self, service: OpenAIService = None, pool: ConversionPool = None,
+                 rows_per_completion: int = None, max_tokens: int = None, concurrency: int = None):
+        settings = get_settings()
+        self.service = service or OpenAIService()
+        self.pool = pool or get_conversion_pool()
+        self.rows_per_completion = max(1, rows_per_completion or settings.mail_merge_rows_per_completion)
+        self.max_tokens = max(1, max_tokens or settings.fill_chunk_max_tokens)
+        self.concurrency = max(1, concurrency or settings.mail_merge_concurrency)
+
+    async def prepare(self, template_docx: bytes) -> MergeTemplate:
+        markdown_text = await self.pool.docx_to_markdown(template_docx)
+        blanks = await self.service.find_blanks_async(markdown_text)
+        logger.info("Mail merge template has %d blanks", len(blanks))
+        return MergeTemplate(markdown_text, blanks)
+
+    def pack(self, template: MergeTemplate, rows: List[Dict[str, Any]], pending: List[int]) -> List[List[int]]:
+        """Groups pending rows so each completion stays within the row count and token budget."""
+        # Each row costs its own fields plus a value for every blank in the answer
+        per_row_overhead = DocumentChunker.estimate_tokens(json.dumps(template.blanks))
+        batches, batch, batch_tokens = [], [], 0
+        for index in pending:
+            tokens = DocumentChunker.estimate_tokens(json.dumps(rows[index], ensure_ascii=False)) + per_row_overhead
+            if batch and (len(batch) >= self.rows_per_completion or batch_tokens + tokens > self.max_tokens):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(index)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def run(self, template_docx: bytes, rows: List[Dict[str, Any]], output_dir: Path, context: str = "",
+                  example: str = None, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        template = await self.prepare(template_docx)
+
+        pending = [index for index in range(len(rows)) if not row_path(output_dir, index).exists()]
+        resumed = len(rows) - len(pending)
+        if resumed:
+            logger.info("Resuming mail merge with %d of %d rows already written", resumed, len(rows))
+
+        batches = self.pack(template, rows, pending) if template.blanks else [[index] for index in pending]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        completed = resumed
+        failed: List[int] = []
+
+        def complete(values: Dict[str, Dict[str, Any]], index: int) -> bool:
+            if not template.blanks:
+                return True  # Nothing to fill: every row is the template as it is
+            row_values = values.get(str(index + 1))
+            return row_values is not None and all(fill_text(row_values.get(blank)) is not None
+                                                  for blank in template.blanks)
+
+        async def fill(batch: List[int]) -> Dict[str, Dict[str, Any]]:
+            if not template.blanks:
+                return {}
+            records = {str(index + 1): rows[index] for index in batch}
+            async with semaphore:
+                values = await self.service.fill_records_async(template.blanks, records, context, example)
+            # Rows the model skipped (or answered in part) in a packed answer get a completion of their own
+            missing = [index for index in batch if not complete(values, index)]
+            if missing and len(batch) > 1:
+                logger.warning("%d of %d packed rows missing from the answer, filling them singly",
+                               len(missing), len(batch))
+                for result in await gather_or_cancel(*(fill([index]) for index in missing)):
+                    values.update(result)
+            return values
+
+        async def run_batch(batch: List[int]):
+            nonlocal completed
+            values = await fill(batch)
+            for index in batch:
+                if not complete(values, index):
+                    # Nothing is written, so resuming tries this row again
+                    failed.append(index + 1)
+                    if progress:
+                        progress({"stage": "row_failed", "row": index + 1, "completed": completed, "total": len(rows)})
+                    continue
+                filled = substitute(template.markdown, values[str(index + 1)] if template.blanks else {})
+                docx_content = await self.pool.markdown_to_docx(filled)
+                # Write-then-rename: a row file only exists once it is complete
+                path = row_path(output_dir, index)
+                tmp_path = path.with_suffix(".tmp")
+                tmp_path.write_bytes(docx_content)
+                os.replace(tmp_path, path)
+                completed += 1
+                if progress:
+                    progress({"stage": "row_completed", "row": index + 1, "completed": completed, "total": len(rows)})
+
+        await gather_or_cancel(*(run_batch(batch) for batch in batches))
+        if failed:
+            logger.warning("%d rows were not filled and will be retried on resume", len(failed))
+        return {
+            "rows": len(rows),
+            "resumed": resumed,
+            "blanks": len(template.blanks),
+            "completions": len(batches) if template.blanks else 0,
+            "failed": sorted(failed),
+        }
+
+
+def archive_members(output_dir: Path, row_count: int):
+    """(name, path) pairs for every written row, in row order, for iter_zip."""
+    for index in range(row_count):
+        path = row_path(Path(output_dir), index)
+        if path.exists():
+            yield path.name, path
+
+
+async def _main(args: argparse.Namespace):
+    rows = parse_rows(Path(args.rows).read_bytes(), args.rows)
+    work_dir = Path(args.work_dir or f"{args.output}.parts")
+    pool = get_conversion_pool()
+    await pool.start()
+    try:
+        summary = await MailMerge(OpenAIService(use_cache=not args.no_cache), pool).run(
+            Path(args.template).read_bytes(),
+            rows,
+            work_dir,
+            context=args.context,
+            progress=lambda event: logger.info("Row %d %s (%d/%d)", event["row"],
+                                               "done" if event["stage"] == "row_completed" else "failed",
+                                               event["completed"], event["total"])
+        )
+    finally:
+        pool.shutdown()
+
+    with open(args.output, "wb") as f:
+        for piece in iter_zip(archive_members(work_dir, len(rows))):
+            f.write(piece)
+    print(json.dumps({**summary, "output": args.output}))
+
+
+def main():
+    from ..logging_config import configure_logging
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("template", help="DOCX template")
+    parser.add_argument("rows", help=".csv with a header line or .jsonl with one object per line")
+    parser.add_argument("-o", "--output", default="merged.zip")
+    parser.add_argument("--context", default="", help="context shared by every row")
+    parser.add_argument("--work-dir", help="where finished rows are kept for resuming (default: <output>.parts)")
+    parser.add_argument("--no-cache", action="store_true", help="skip the completion cache")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    configure_logging(settings.log_level, settings.log_format)
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import threading
+import time
+import uuid
+
+# Trace ID of the request being handled, picked up by log records and job events
+trace_id_var: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], bucket: Optional[str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if bucket is not None:
+        pairs.append(f'le="{bucket}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, labels: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.label_names), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        if not self.registry.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    labels = _format_labels(self.label_names, key, str(bound))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                cumulative += counts[-1]
+                labels = _format_labels(self.label_names, key, "+Inf")
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total[0]}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: List = []
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(self, name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(self, name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "docfiller_stage_seconds",
+    "Time spent per processing stage (conversion, blank_detection, llm_call, substitution, docx_rebuild).",
+    ["stage"]
+)
+PIPELINE_BLOCK_SECONDS = registry.histogram(
+    "docfiller_pipeline_block_seconds", "Time spent executing each pipeline block type.", ["block"]
+)
+LLM_REQUESTS = registry.counter(
+    "docfiller_llm_requests_total", "Completion requests sent to the LLM API by outcome.", ["outcome"]
+)
+LLM_TOKENS = registry.counter(
+    "docfiller_llm_tokens_total",
+    "Tokens reported in completion usage (type prompt/completion), or estimated when a response "
+    "carried none (prompt_estimated/completion_estimated).",
+    ["type"]
+)
+CACHE_REQUESTS = registry.counter(
+    "docfiller_cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"]
+)
+PREFILL_BLANKS = registry.counter(
+    "docfiller_prefill_blanks_total", "Blanks answered from structured context or left for the model.", ["result"]
+)
+LLM_AVOIDED = registry.counter(
+    "docfiller_llm_avoided_total", "Completions and estimated tokens saved by deterministic pre-fill.", ["type"]
+)
+CONTEXT_TOKENS_TRIMMED = registry.counter(
+    "docfiller_context_tokens_trimmed_total", "Estimated context tokens left out of prompts by passage retrieval."
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "docfiller_http_request_seconds", "HTTP request latency by route.", ["method", "route", "status"]
+)
+
+
+def stage_timer(stage: str):
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_usage(completion) -> None:
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, type="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, type="completion")
+
+
+def record_estimated_usage(prompt_tokens: int, completion_tokens: int) -> None:
+    LLM_TOKENS.inc(prompt_tokens, type="prompt_estimated")
+    LLM_TOKENS.inc(completion_tokens, type="completion_estimated")
+
+
+def record_prefill(resolved: int, unresolved: int, calls_avoided: int, tokens_avoided: int):
+    PREFILL_BLANKS.inc(resolved, result="resolved")
+    PREFILL_BLANKS.inc(unresolved, result="unresolved")
+    LLM_AVOIDED.inc(calls_avoided, type="calls")
+    LLM_AVOIDED.inc(tokens_avoided, type="tokens")
@@ -0,0 +1,165 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import json
+
+# Node types the runner knows how to execute, and which of them pass a document along
+BLOCK_TYPES = ("DOCUMENT_INPUT", "TEXT_INPUT", "BLANK_FINDER", "GPT_MODEL", "TEMPLATE_MODEL", "DOCUMENT_OUTPUT")
+DOCUMENT_CONSUMERS = ("BLANK_FINDER", "GPT_MODEL", "TEMPLATE_MODEL", "DOCUMENT_OUTPUT")
+DOCUMENT_PRODUCERS = ("DOCUMENT_INPUT", "BLANK_FINDER", "GPT_MODEL", "TEMPLATE_MODEL", "DOCUMENT_OUTPUT")
+
+# Source id used for steps that read the uploaded file directly
+UPLOAD_SOURCE = None
+
+
+class PipelineCompileError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class PipelineStep:
+    id: str
+    type: str
+    config: Dict[str, Any]
+    document_source: Optional[str]
+    context: str
+    level: int
+
+
+@dataclass(frozen=True)
+class PipelinePlan:
+    steps: Tuple[PipelineStep, ...]
+    levels: Tuple[Tuple[PipelineStep, ...], ...]
+
+
+def _normalize(config: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Both formats reduce to (nodes, edges).
+
+    Saved pipelines store {"nodes": [...], "edges": [...]} with settings under node["data"];
+    the execute endpoint receives {"blocks": [...]} with settings under block["config"] and
+    incoming connections listed in block["config"]["inputs"].
+    """
+    if "nodes" in config:
+        nodes = [{"id": node["id"], "type": node["type"], "config": node.get("data") or {}} for node in config["nodes"]]
+        edges = list(config.get("edges", []))
+    elif "blocks" in config:
+        nodes = [{"id": block["id"], "type": block["type"], "config": block.get("config") or {}} for block in config["blocks"]]
+        edges = [
+            {**connection, "targetId": block["id"]}
+            for block in config["blocks"]
+            for connection in (block.get("config") or {}).get("inputs", [])
+        ]
+    else:
+        raise PipelineCompileError("Pipeline config needs either 'blocks' or 'nodes'")
+    return nodes, edges
+
+
+def compile_pipeline(config: Dict[str, Any]) -> PipelinePlan:
+    nodes, edges = _normalize(config)
+
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for node in nodes:
+        if node["type"] not in BLOCK_TYPES:
+            raise PipelineCompileError(f"Unknown block type '{node['type']}' on node {node['id']}")
+        if node["id"] in by_id:
+            raise PipelineCompileError(f"Duplicate node id {node['id']}")
+        by_id[node["id"]] = node
+
+    document_sources: Dict[str, str] = {}
+    context_sources: Dict[str, List[str]] = defaultdict(list)
+    for edge in edges:
+        source_id, target_id = edge.get("sourceId"), edge.get("targetId")
+        if source_id not in by_id or target_id not in by_id:
+            raise PipelineCompileError(f"Edge {source_id} -> {target_id} references a missing node")
+        if edge.get("targetInput") == "context":
+            context_sources[target_id].append(source_id)
+        elif by_id[target_id]["type"] in DOCUMENT_CONSUMERS:
+            document_sources[target_id] = source_id
+
+    # Blocks without an explicit document edge take the previous document-carrying block,
+    # which is exactly how the old flat list was interpreted
+    previous_producer = UPLOAD_SOURCE
+    for node in nodes:
+        if node["type"] in DOCUMENT_CONSUMERS and node["id"] not in document_sources:
+            document_sources[node["id"]] = previous_producer
+        if node["type"] in DOCUMENT_PRODUCERS:
+            previous_producer = node["id"]
+
+    dependencies: Dict[str, List[str]] = {
+        node_id: [source for source in [document_sources.get(node_id)] + context_sources[node_id] if source]
+        for node_id in by_id
+    }
+
+    # Kahn's algorithm; ties keep the original block order so legacy pipelines run unchanged
+    position = {node["id"]: index for index, node in enumerate(nodes)}
+    remaining = {node_id: len(set(deps)) for node_id, deps in dependencies.items()}
+    dependents: Dict[str, List[str]] = defaultdict(list)
+    for node_id, deps in dependencies.items():
+        for dep in set(deps):
+            dependents[dep].append(node_id)
+
+    levels: Dict[str, int] = {}
+    ready = sorted((node_id for node_id, count in remaining.items() if count == 0), key=position.get)
+    order: List[str] = []
+    while ready:
+        node_id = ready.pop(0)
+        order.append(node_id)
+        levels[node_id] = max((levels[dep] + 1 for dep in dependencies[node_id]), default=0)
+        for dependent in dependents[node_id]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+        ready.sort(key=position.get)
+
+    if len(order) != len(by_id):
+        cyclic = sorted(node_id for node_id, count in remaining.items() if count > 0)
+        raise PipelineCompileError(f"Pipeline contains a cycle through: {', '.join(cyclic)}")
+
+    steps = []
+    for node_id in order:
+        node = by_id[node_id]
+        context = "\n\n".join(
+            by_id[source]["config"].get("text", "")
+            for source in context_sources[node_id]
+            if by_id[source]["type"] == "TEXT_INPUT"
+        )
+        steps.append(PipelineStep(node_id, node["type"], node["config"], document_sources.get(node_id), context, levels[node_id]))
+
+    grouped: Dict[int, List[PipelineStep]] = defaultdict(list)
+    for step in steps:
+        grouped[step.level].append(step)
+    return PipelinePlan(tuple(steps), tuple(tuple(grouped[level]) for level in sorted(grouped)))
+
+
+@lru_cache(maxsize=128)
+def _compile_saved(name: str, version: int) -> PipelinePlan:
+    # A saved version never changes, so its plan can be cached for good
+    from .pipeline_store import get_pipeline_store
+    return compile_pipeline(get_pipeline_store().get(name, version).config)
+
+
+@lru_cache(maxsize=128)
+def _compile_inline(serialized_config: str) -> PipelinePlan:
+    return compile_pipeline(json.loads(serialized_config))
+
+
+def get_pipeline_plan(config: Dict[str, Any]) -> PipelinePlan:
+    """Compiled plan for an inline config, or for a saved pipeline referenced by 'pipeline_name'.
+
+    A saved pipeline runs its latest version unless 'pipeline_version' pins one. Plans
+    are cached by name and version, inline configs by their canonical JSON, so a batch
+    (or repeated runs of the same pipeline) compiles once.
+    """
+    if "blocks" not in config and "nodes" not in config and config.get("pipeline_name"):
+        from .pipeline_store import get_pipeline_store
+        name, version = config["pipeline_name"], config.get("pipeline_version")
+        if version is not None and not str(version).isdigit():
+            raise PipelineCompileError(f"Invalid pipeline version: {version}")
+        stored = get_pipeline_store().get(name, int(version) if version is not None else None)
+        if stored is None:
+            suffix = f" version {version}" if version is not None else ""
+            raise PipelineCompileError(f"Pipeline {name}{suffix} not found")
+        return _compile_saved(stored.name, stored.version)
+
+    return _compile_inline(json.dumps(config, sort_keys=True))
@@ -0,0 +1,206 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from .document_cache import DocumentCache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StoredPipeline:
+    name: str
+    version: int
+    config: Dict[str, Any]
+    created_at: float
+
+
+class PipelineStore:
+    """Saved pipelines in SQLite (WAL), with every save kept as a new version.
+
+    pipelines          one row per name: latest version and timestamps, for listing
+    pipeline_versions  the config of every version ever saved
+
+    Reads go through an in-process cache that is dropped on every write, including
+    writes committed by other workers sharing the database (seen via data_version).
+    Every method blocks (a save may wait up to busy_timeout for another writer), so
+    async callers run them in a thread.
+    """
+
+    def __init__(self, path: str, cache_entries: int = 256):
+        self.path = Path(path)
+        self.cache = DocumentCache(cache_entries, name="pipeline")
+        self._lock = threading.Lock()
+        self._data_version = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Workers saving at the same moment wait for each other rather than fail
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pipelines (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pipeline_versions (
+                name TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                config TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (name, version)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pipelines_updated_at ON pipelines(updated_at)")
+
+    def _check_data_version(self):
+        # data_version changes whenever another connection commits, so a cache filled
+        # before some other worker's save is never served after it
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            if self._data_version is not None:
+                self.cache.clear()
+            self._data_version = data_version
+
+    def save(self, name: str, config: Dict[str, Any], created_at: float = None, replace: bool = True) -> int:
+        """Stores config as the next version of name and returns that version.
+
+        Saving the same config as the current version is a no-op returning its number,
+        as is any save of an existing name with replace=False.
+        """
+        version, _ = self._save(name, config, created_at, replace)
+        return version
+
+    def _save(self, name: str, config: Dict[str, Any], created_at: float = None,
+              replace: bool = True) -> Tuple[int, bool]:
+        """(version, whether a new version was written)."""
+        serialized = json.dumps(config, sort_keys=True, ensure_ascii=False)
+        now = created_at or time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT v.version, v.config FROM pipelines p "
+                    "JOIN pipeline_versions v ON v.name = p.name AND v.version = p.version WHERE p.name = ?",
+                    (name,)
+                ).fetchone()
+                if row is not None and (row[1] == serialized or not replace):
+                    self._conn.execute("COMMIT")
+                    return row[0], False
+                version = row[0] + 1 if row is not None else 1
+                self._conn.execute(
+                    "INSERT INTO pipeline_versions (name, version, config, created_at) VALUES (?, ?, ?, ?)",
+                    (name, version, serialized, now)
+                )
+                self._conn.execute(
+                    "INSERT INTO pipelines (name, version, created_at, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET version = excluded.version, updated_at = excluded.updated_at",
+                    (name, version, now, now)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.cache.clear()
+        logger.info("Saved pipeline", extra={"pipeline": name, "version": version})
+        return version, True
+
+    def get(self, name: str, version: int = None) -> Optional[StoredPipeline]:
+        """The latest version of a pipeline, or a specific one; None if there is no such pipeline or version."""
+        key = (name, version)
+        with self._lock:
+            self._check_data_version()
+            stored = self.cache.get(key)
+            if stored is not None:
+                return stored
+            if version is None:
+                row = self._conn.execute(
+                    "SELECT v.version, v.config, v.created_at FROM pipelines p "
+                    "JOIN pipeline_versions v ON v.name = p.name AND v.version = p.version WHERE p.name = ?",
+                    (name,)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT version, config, created_at FROM pipeline_versions WHERE name = ? AND version = ?",
+                    (name, version)
+                ).fetchone()
+            if row is None:
+                return None
+            stored = StoredPipeline(name, row[0], json.loads(row[1]), row[2])
+            self.cache.put(key, stored)
+            return stored
+
+    def list(self, offset: int = 0, limit: int = 50, query: str = None) -> Tuple[List[Dict[str, Any]], int]:
+        """A page of pipelines, most recently saved first, optionally only names containing query."""
+        where, params = "", []
+        if query:
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where, params = "WHERE name LIKE ? ESCAPE '\\'", [f"%{escaped}%"]
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM pipelines {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT name, version, created_at, updated_at FROM pipelines {where} "
+                "ORDER BY updated_at DESC, name LIMIT ? OFFSET ?",
+                params + [max(0, limit), max(0, offset)]
+            ).fetchall()
+        return [
+            {"name": name, "version": version, "created": created_at, "modified": updated_at}
+            for name, version, created_at, updated_at in rows
+        ], total
+
+    def versions(self, name: str) -> List[Dict[str, Any]]:
+        """Version history of a pipeline, newest first; empty if it was never saved."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT version, created_at FROM pipeline_versions WHERE name = ? ORDER BY version DESC", (name,)
+            ).fetchall()
+        return [{"version": version, "created": created_at} for version, created_at in rows]
+
+    def migrate_directory(self, directory: str) -> int:
+        """Imports <name>.json files not yet in the store, keeping their mtime; returns how many were added.
+
+        The files are left in place, so running it again (or from several workers) is harmless.
+        """
+        path = Path(directory)
+        if not path.is_dir():
+            return 0
+        imported = 0
+        for file in sorted(path.glob("*.json")):
+            if self.get(file.stem) is not None:
+                continue
+            try:
+                with open(file) as f:
+                    config = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping unreadable pipeline %s: %s", file, e)
+                continue
+            # Checked again inside the save transaction, in case another worker got there first
+            _, inserted = self._save(file.stem, config, created_at=file.stat().st_mtime, replace=False)
+            imported += inserted
+        if imported:
+            logger.info("Migrated %d saved pipelines from %s", imported, path)
+        return imported
+
+
+@lru_cache()
+def get_pipeline_store() -> PipelineStore:
+    from ..config import get_settings
+    settings = get_settings()
+    store = PipelineStore(settings.pipeline_store_path, settings.pipeline_cache_entries)
+    store.migrate_directory(settings.pipeline_dir)
+    return store
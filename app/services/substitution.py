@@ -0,0 +1,57 @@
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, Optional
+import re
+
+from .metrics import stage_timer
+
+
+def fill_text(value: Any) -> Optional[str]:
+    """Text to write for a filled value, or None when there is nothing usable to write.
+
+    Models answer with JSON, so a value can be null, an object or a list; those leave
+    the placeholder unfilled rather than putting "None" or a repr into the document.
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return None
+
+
+class Substitutor:
+    """Replaces a fixed set of placeholder keys in a single left-to-right pass.
+
+    All keys are compiled into one alternation (longest first, so "[Name]" wins over a
+    shorter overlapping key), which means replaced values are never rescanned and the
+    text is copied once instead of once per key.
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        ordered = sorted({key for key in keys if key}, key=len, reverse=True)
+        self.keys = frozenset(ordered)
+        self.regex = re.compile("|".join(re.escape(key) for key in ordered)) if ordered else None
+
+    def substitute(self, text: str, values: Dict[str, str]) -> str:
+        if self.regex is None:
+            return text
+        with stage_timer("substitution"):
+            return self.regex.sub(lambda match: self._replacement(match.group(0), values), text)
+
+    @staticmethod
+    def _replacement(key: str, values: Dict[str, Any]) -> str:
+        value = fill_text(values.get(key))
+        return key if value is None else value
+
+
+@lru_cache(maxsize=256)
+def _compiled_substitutor(keys: FrozenSet[str]) -> Substitutor:
+    return Substitutor(keys)
+
+
+def get_substitutor(keys: Iterable[str]) -> Substitutor:
+    """Compiled substitutor for a key set, shared by every document using the same keys."""
+    return _compiled_substitutor(frozenset(keys))
+
+
+def substitute(text: str, values: Dict[str, str]) -> str:
+    return get_substitutor(values.keys()).substitute(text, values)
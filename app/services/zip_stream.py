@@ -0,0 +1,62 @@
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple, Union
+import io
+import zipfile
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable file that hands back whatever was written since the last drain.
+
+    zipfile falls back to data descriptors on unseekable output, so an archive can be
+    produced front to back without ever holding more than one member in memory.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ZipStreamWriter:
+    """Builds a ZIP archive incrementally; each call returns the bytes ready to send.
+
+    Members are stored rather than deflated: DOCX files are already compressed.
+    """
+
+    def __init__(self):
+        self._sink = _ChunkSink()
+        self._archive = zipfile.ZipFile(self._sink, "w", compression=zipfile.ZIP_STORED)
+
+    def add(self, name: str, content: Union[bytes, str, Path]) -> bytes:
+        if isinstance(content, Path):
+            self._archive.write(content, name)
+        else:
+            self._archive.writestr(name, content)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._archive.close()
+        return self._sink.drain()
+
+
+def iter_zip(members: Iterable[Tuple[str, Union[bytes, str, Path]]]) -> Iterator[bytes]:
+    """Yields a ZIP archive of (name, content or path) members piece by piece as they are added."""
+    writer = ZipStreamWriter()
+    for name, content in members:
+        yield writer.add(name, content)
+    yield writer.close()
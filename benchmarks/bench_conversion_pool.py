@@ -0,0 +1,54 @@
+"""Conversion throughput of ConversionPool as the worker count grows.
+
+    python -m benchmarks.bench_conversion_pool --workers 0 1 2 4 --docs 32 --pages 20
+
+Each run converts distinct documents (so the document cache never hits) and
+reports docs/sec per worker count as JSON on stdout.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from app.services.conversion_pool import ConversionPool, _docx_to_markdown
+from benchmarks.docx_generator import generate_docx
+
+
+async def measure(workers: int, documents) -> dict:
+    pool = ConversionPool(workers)
+    await pool.start()
+    try:
+        started = time.perf_counter()
+        # Call the worker function directly through the pool so the in-process cache is bypassed
+        await asyncio.gather(*(pool._run(_docx_to_markdown, content) for content in documents))
+        elapsed = time.perf_counter() - started
+    finally:
+        pool.shutdown()
+    return {
+        "workers": workers,
+        "documents": len(documents),
+        "seconds": round(elapsed, 4),
+        "docs_per_sec": round(len(documents) / elapsed, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, os.cpu_count() or 1])
+    parser.add_argument("--docs", type=int, default=32)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--tables", type=int, default=5)
+    args = parser.parse_args()
+
+    documents = [generate_docx(args.pages, blanks=20, tables=args.tables, seed=i) for i in range(args.docs)]
+    results = [await measure(workers, documents) for workers in args.workers]
+
+    baseline = results[0]["docs_per_sec"]
+    for result in results:
+        result["speedup"] = round(result["docs_per_sec"] / baseline, 2)
+    print(json.dumps({"benchmark": "conversion_pool", "cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
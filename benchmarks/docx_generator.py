@@ -0,0 +1,57 @@
+"""Synthetic DOCX fixtures for benchmarks: N pages of text with M blanks and T tables."""
+from docx import Document
+import argparse
+import io
+import random
+
+PARAGRAPHS_PER_PAGE = 12
+BLANK_STYLES = ["[Field {n}]", "__________", "[Date {n}]", "[Name {n}]"]
+WORDS = ("agreement party shall provide services under terms conditions payment schedule "
+         "hereinafter referred effective date obligations confidentiality termination notice").split()
+
+
+def generate_docx(pages: int = 5, blanks: int = 20, tables: int = 2, table_rows: int = 10,
+                  table_cols: int = 4, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    doc = Document()
+    doc.add_heading(f"Synthetic document {seed}", level=1)
+
+    paragraph_count = max(1, pages * PARAGRAPHS_PER_PAGE)
+    # Spread the blanks evenly across the paragraphs
+    blank_slots = {round(i * paragraph_count / blanks) for i in range(blanks)} if blanks else set()
+    blank_number = 0
+
+    for index in range(paragraph_count):
+        if index and index % PARAGRAPHS_PER_PAGE == 0:
+            doc.add_heading(f"Section {index // PARAGRAPHS_PER_PAGE}", level=2)
+        words = [rng.choice(WORDS) for _ in range(rng.randint(30, 60))]
+        if index in blank_slots:
+            blank_number += 1
+            words.insert(rng.randint(0, len(words)), rng.choice(BLANK_STYLES).format(n=blank_number))
+        doc.add_paragraph(" ".join(words).capitalize() + ".")
+
+    for table_index in range(tables):
+        table = doc.add_table(rows=table_rows, cols=table_cols)
+        for row_index, row in enumerate(table.rows):
+            for col_index, cell in enumerate(row.cells):
+                cell.text = f"T{table_index} R{row_index} C{col_index} {rng.choice(WORDS)}"
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--blanks", type=int, default=20)
+    parser.add_argument("--tables", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    with open(args.output, "wb") as f:
+        f.write(generate_docx(args.pages, args.blanks, args.tables, seed=args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Local OpenAI-compatible stub for benchmarks and load tests.
+
+Serves POST /v1/chat/completions with deterministic answers to the prompts
+OpenAIService sends, after a simulated delay of
+    latency + completion_tokens / tokens_per_second
+and optionally rejects a fraction of requests with 429s. Requests with
+"stream": true get the same answer as server-sent chunks, paced at
+tokens_per_second after the initial latency.
+
+    python -m benchmarks.mock_llm_server --port 8100 --latency 0.3 --tokens-per-second 200
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=stub ./run.sh
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import re
+import threading
+import time
+
+BLANK_PATTERN = re.compile(r'\[[^\[\]\n]+\]|_{3,}')
+
+
+def _between(text: str, start: str, end: str) -> str:
+    head, _, tail = text.partition(start)
+    return tail.partition(end)[0] if tail else ""
+
+
+def answer(messages) -> dict:
+    """The JSON body OpenAIService expects for an identification or fill prompt."""
+    prompt = messages[-1]["content"] if messages else ""
+    if "Records:" in prompt:
+        try:
+            blanks = json.loads(_between(prompt, "Blanks to fill:\n", "\n\nShared context:"))
+            records = json.loads(_between(prompt, "Records:\n", "\n\nReturn format example:"))
+        except ValueError:
+            blanks, records = [], {}
+        return {"records": {
+            record_id: {blank: f"{record_id}.{index + 1}" for index, blank in enumerate(blanks)}
+            for record_id in records
+        }}
+    if "Blanks to fill:" in prompt:
+        try:
+            blanks = json.loads(_between(prompt, "Blanks to fill:\n", "\n\nContext:"))
+        except ValueError:
+            blanks = []
+        # Items are {"id", "blank", "text"} objects answered by ID; plain strings are their own key
+        return {"filled_values": {
+            (blank["id"] if isinstance(blank, dict) else blank): f"value {index + 1}"
+            for index, blank in enumerate(blanks)
+        }}
+    document = _between(prompt, "Document:\n", "\n\nReturn format example:")
+    return {"blanks": list(dict.fromkeys(BLANK_PATTERN.findall(document)))}
+
+
+class MockLLMServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.2,
+                 tokens_per_second: float = 200.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.requests = 0
+        self.rate_limited = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: dict = None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+
+                with server._lock:
+                    server.requests += 1
+                    throttled = server._random.random() < server.error_rate
+                    if throttled:
+                        server.rate_limited += 1
+                if throttled:
+                    self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                    {"retry-after": "0.1"})
+                    return
+
+                messages = body.get("messages", [])
+                content = json.dumps(answer(messages))
+                prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+                completion_tokens = max(1, len(content) // 4)
+                usage = {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                }
+                if body.get("stream"):
+                    self._stream(body, content, usage)
+                    return
+                if server.tokens_per_second > 0:
+                    time.sleep(server.latency + completion_tokens / server.tokens_per_second)
+                else:
+                    time.sleep(server.latency)
+
+                self._send_json(200, {
+                    "id": f"chatcmpl-mock-{server.requests}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }],
+                    "usage": usage,
+                })
+
+            def _stream(self, body: dict, content: str, usage: dict):
+                # Close the connection at the end instead of chunked transfer encoding
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                def send(choices, chunk_usage=None):
+                    chunk = {
+                        "id": f"chatcmpl-mock-{server.requests}",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "mock"),
+                        "choices": choices,
+                        "usage": chunk_usage,
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+                time.sleep(server.latency)
+                piece = 16  # About four tokens per chunk
+                for start in range(0, len(content), piece):
+                    if server.tokens_per_second > 0:
+                        time.sleep(piece / 4 / server.tokens_per_second)
+                    send([{"index": 0, "finish_reason": None, "delta": {"content": content[start:start + piece]}}])
+                send([{"index": 0, "finish_reason": "stop", "delta": {}}])
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    send([], usage)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.2, help="fixed seconds per completion")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.host, args.port, args.latency, args.tokens_per_second, args.error_rate)
+    print(f"Mock LLM server listening on {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""End-to-end benchmark suite against a local mock LLM server.
+
+Starts benchmarks.mock_llm_server and the API under uvicorn, drives the chosen
+scenarios at each concurrency level and writes a JSON report:
+
+    python -m benchmarks.run_benchmarks --concurrency 1 4 16 --requests 32 --output bench.json
+    python -m benchmarks.run_benchmarks --baseline bench.json   # exit 1 on regressions
+
+Reported per scenario and concurrency: p50/p95/p99/mean latency, docs/sec,
+errors and the API process's peak RSS. A separate in-process pass times the
+individual stages (conversion, blank detection, LLM fill, substitution, DOCX
+rebuild) for one document, and the server's own per-stage means are read
+back from its /metrics endpoint.
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.docx_generator import generate_docx
+from benchmarks.mock_llm_server import MockLLMServer
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BUNDLED_DOCUMENT = REPO_ROOT / "temp.docx"
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+CONTEXT = "Name: Jane Doe\nCompany: Example S.p.A.\nDate: 2024-03-15\nRole: Chief Executive Officer"
+PIPELINE_BLOCKS = [
+    {"id": "input", "type": "DOCUMENT_INPUT", "config": {}},
+    {"id": "context", "type": "TEXT_INPUT", "config": {"text": CONTEXT}},
+    {"id": "fill", "type": "GPT_MODEL", "config": {
+        "use_cache": False,
+        "inputs": [{"sourceId": "context", "targetInput": "context"}],
+    }},
+    {"id": "output", "type": "DOCUMENT_OUTPUT", "config": {}},
+]
+# Metrics where a larger number is worse, used when comparing against a baseline
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    # VmHWM is the process's high-water resident set size; Linux only
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+class ApiServer:
+    def __init__(self, env: Dict[str, str]):
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--log-level", "warning"],
+            cwd=REPO_ROOT,
+            env={**os.environ, **env},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def wait_ready(self, timeout: float = 60.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("API server exited during startup")
+            try:
+                if httpx.get(f"{self.base_url}/health", timeout=1.0).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError("API server did not become ready")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def build_request(scenario: str, index: int, documents: List[bytes], markdown: str, files_per_request: int):
+    document = documents[index % len(documents)]
+    if scenario == "convert_and_fill":
+        return "/convert-and-fill", {
+            "files": {"file": (f"doc{index}.docx", document, DOCX_MEDIA_TYPE)},
+            "data": {"request": json.dumps({"context": CONTEXT, "use_cache": False})},
+        }, 1
+    if scenario == "pipeline_execute":
+        files = [
+            ("files", (f"doc{index}_{n}.docx", documents[(index + n) % len(documents)], DOCX_MEDIA_TYPE))
+            for n in range(files_per_request)
+        ]
+        return "/api/pipeline/execute", {
+            "files": files,
+            "data": {"pipeline_config": json.dumps({"blocks": PIPELINE_BLOCKS})},
+        }, files_per_request
+    if scenario == "download_docx":
+        return "/download-docx", {"json": {"content": markdown}}, 1
+    raise ValueError(f"Unknown scenario {scenario}")
+
+
+async def run_scenario(api: ApiServer, scenario: str, concurrency: int, total_requests: int,
+                       documents: List[bytes], markdown: str, files_per_request: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    docs = 0
+    next_index = 0
+
+    async with httpx.AsyncClient(base_url=api.base_url, timeout=600.0) as client:
+        async def worker():
+            nonlocal errors, docs, next_index
+            while next_index < total_requests:
+                index = next_index
+                next_index += 1
+                path, kwargs, doc_count = build_request(scenario, index, documents, markdown, files_per_request)
+                started = time.perf_counter()
+                try:
+                    response = await client.post(path, **kwargs)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - started)
+                if ok:
+                    docs += doc_count
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "docs_per_sec": round(docs / wall, 3) if wall else 0.0,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "peak_rss_mb": peak_rss_mb(api.process.pid),
+    }
+
+
+async def measure_stages(document: bytes) -> Dict[str, float]:
+    """Times each stage of a single fill in-process, against the same mock server."""
+    from app.services.document_converter import DocumentConverter
+    from app.services.blank_detector import get_blank_detector
+    from app.services.openai_service import OpenAIService
+    from app.services.substitution import substitute
+
+    timings = {}
+
+    started = time.perf_counter()
+    markdown = DocumentConverter._convert_docx(document)
+    timings["conversion_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    blanks = get_blank_detector().unique_blanks(markdown)
+    timings["blank_detection_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    filled = await OpenAIService(use_cache=False).fill_blanks_async(markdown, CONTEXT)
+    timings["llm_fill_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    substitute(markdown, {blank: f"value {index}" for index, blank in enumerate(blanks)})
+    timings["substitution_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    DocumentConverter().markdown_to_docx(filled)
+    timings["docx_rebuild_ms"] = (time.perf_counter() - started) * 1000
+
+    return {name: round(value, 2) for name, value in timings.items()}
+
+
+def server_stage_means(api: ApiServer) -> Dict[str, Dict[str, float]]:
+    """Mean time and count per stage from the API's /metrics, covering every request in the run."""
+    try:
+        text = httpx.get(f"{api.base_url}/metrics", timeout=10.0).text
+    except httpx.HTTPError:
+        return {}
+    sums, counts = {}, {}
+    for line in text.splitlines():
+        for suffix, target in (("_sum", sums), ("_count", counts)):
+            prefix = f"docfiller_stage_seconds{suffix}{{stage=\""
+            if line.startswith(prefix):
+                stage, _, value = line[len(prefix):].partition('"} ')
+                target[stage] = float(value)
+    return {
+        stage: {"mean_ms": round(sums[stage] / counts[stage] * 1000, 2), "count": int(counts[stage])}
+        for stage in sums if counts.get(stage)
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get((result["scenario"], result["concurrency"]))
+        if not old:
+            continue
+        for metric in LOWER_IS_BETTER:
+            if old.get(metric) and result.get(metric) and result[metric] > old[metric] * (1 + tolerance):
+                regressions.append(f"{result['scenario']}@{result['concurrency']} {metric}: {old[metric]} -> {result[metric]}")
+        if old.get("docs_per_sec") and result["docs_per_sec"] < old["docs_per_sec"] * (1 - tolerance):
+            regressions.append(f"{result['scenario']}@{result['concurrency']} docs_per_sec: {old['docs_per_sec']} -> {result['docs_per_sec']}")
+    return regressions
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=["convert_and_fill", "pipeline_execute", "download_docx"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="requests per scenario and concurrency level")
+    parser.add_argument("--files-per-request", type=int, default=4, help="files per pipeline_execute request")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--blanks", type=int, default=30)
+    parser.add_argument("--tables", type=int, default=3)
+    parser.add_argument("--distinct-docs", type=int, default=8, help="synthetic documents cycled through")
+    parser.add_argument("--include-bundled", action="store_true", help="also cycle through the bundled temp.docx")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+
+    documents = [generate_docx(args.pages, args.blanks, args.tables, seed=seed) for seed in range(args.distinct_docs)]
+    if args.include_bundled and BUNDLED_DOCUMENT.exists():
+        documents.append(BUNDLED_DOCUMENT.read_bytes())
+
+    mock = MockLLMServer(latency=args.llm_latency, tokens_per_second=args.llm_tokens_per_second,
+                         error_rate=args.llm_error_rate).start()
+    workdir = tempfile.mkdtemp(prefix="docfiller-bench-")
+    env = {
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": mock.base_url,
+        "COMPLETION_CACHE_PATH": os.path.join(workdir, "completions.sqlite3"),
+        "JOB_DATA_DIR": os.path.join(workdir, "jobs"),
+    }
+    os.environ.update(env)
+
+    from app.services.document_converter import DocumentConverter
+    markdown = DocumentConverter._convert_docx(documents[0])
+
+    api = ApiServer(env)
+    results = []
+    try:
+        api.wait_ready()
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                result = await run_scenario(api, scenario, concurrency, args.requests, documents, markdown,
+                                            args.files_per_request)
+                print(f"{scenario:>18} c={concurrency:<3} p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+                      f"docs/s={result['docs_per_sec']} errors={result['errors']}", file=sys.stderr)
+                results.append(result)
+        server_stages = server_stage_means(api)
+        stages = await measure_stages(documents[0])
+    finally:
+        api.stop()
+        mock.stop()
+
+    report = {
+        "generated_at": time.time(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "parameters": {
+            key: value for key, value in vars(args).items() if key not in ("output", "baseline")
+        },
+        "mock_llm": {"requests": mock.requests, "rate_limited": mock.rate_limited},
+        "stages": stages,
+        "server_stages": server_stages,
+        "results": results,
+    }
+
+    serialized = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(serialized)
+    else:
+        print(serialized)
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
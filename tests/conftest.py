@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Settings are validated on first use; tests never reach a real model or shared caches
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("COMPLETION_CACHE_ENABLED", "false")
+os.environ.setdefault("CONVERSION_WORKERS", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# The app's on-disk state (jobs, saved pipelines) goes to a scratch directory
+_scratch = tempfile.mkdtemp(prefix="docfiller-tests-")
+os.environ.setdefault("JOB_DATA_DIR", os.path.join(_scratch, "jobs"))
+os.environ.setdefault("PIPELINE_STORE_PATH", os.path.join(_scratch, "pipelines.sqlite3"))
+os.environ.setdefault("PIPELINE_DIR", os.path.join(_scratch, "saved_pipelines"))
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
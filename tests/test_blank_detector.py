@@ -0,0 +1,34 @@
+import re
+
+import pytest
+
+from app.services.blank_detector import BlankDetector
+
+
+def spans(detector, text):
+    return [(match.text, match.kind) for match in detector.find(text)]
+
+
+def test_builtin_styles_in_document_order():
+    detector = BlankDetector(["brackets", "underscores", "braces"])
+    assert spans(detector, "Dear [Name], sign ____ on {{date}}") == [
+        ("[Name]", "brackets"), ("____", "underscores"), ("{{date}}", "braces")
+    ]
+
+
+def test_custom_patterns_keep_backreferences_and_inline_flags():
+    detector = BlankDetector(["brackets", r"(['\"])\?\1", r"(?i)todo"])
+    assert spans(detector, "[A] '?' \"?' TODO and todo") == [
+        ("[A]", "brackets"), ("'?'", "custom_1"), ("TODO", "custom_2"), ("todo", "custom_2")
+    ]
+
+
+def test_overlapping_matches_resolve_like_one_alternation():
+    detector = BlankDetector([r"\[x+", "brackets", r"x*"])
+    # Same start: the pattern listed first wins; later matches never overlap it
+    assert spans(detector, "[xx] [ab]") == [("[xx", "custom_0"), ("[ab]", "brackets")]
+
+
+def test_invalid_custom_pattern_fails_early():
+    with pytest.raises(re.error):
+        BlankDetector(["brackets", "(unclosed"])
@@ -0,0 +1,53 @@
+from app.services.blank_detector import BlankDetector
+from app.services.blank_index import MARKER, BlankIndex
+
+DETECTOR = BlankDetector(["brackets", "underscores"])
+DOCUMENT = (
+    "# Contract\n\nParty A: ________ and Party B: ________\n\n"
+    "## Payment\n\nDate: [Date] amount ________\n\n"
+    "## Term\n\nStart [Date], end [Date]. Name: [Name]"
+)
+
+
+def test_every_occurrence_gets_its_own_id_and_section():
+    index = BlankIndex.build(DOCUMENT, DETECTOR)
+    assert [o.text for o in index.occurrences] == [
+        "________", "________", "[Date]", "________", "[Date]", "[Date]", "[Name]"
+    ]
+    assert [o.id for o in index.occurrences] == list(range(1, 8))
+    assert index.title == "Contract"
+    assert index.occurrences[0].section == "Contract"
+    assert index.occurrences[2].section == "Contract > Payment"
+    assert index.occurrences[6].section == "Contract > Term"
+    for occurrence in index.occurrences:
+        assert DOCUMENT[occurrence.start:occurrence.end] == occurrence.text
+        assert MARKER.format(occurrence.id) in occurrence.window
+
+
+def test_window_is_trimmed_to_words():
+    text = "alpha beta gamma [X] delta epsilon zeta"
+    occurrence = BlankIndex.build(text, DETECTOR, window_chars=8).occurrences[0]
+    assert occurrence.window == "gamma ⟦1⟧ delta"
+
+
+def test_splice_fills_repeated_placeholders_independently():
+    index = BlankIndex.build("[A] [A] ___ ___", DETECTOR)
+    assert index.splice({1: "x", 2: "y", 3: "1", 4: 2}) == "x y 1 2"
+
+
+def test_splice_leaves_missing_and_unusable_values():
+    index = BlankIndex.build("[A] [B] [C] [D]", DETECTOR)
+    assert index.splice({1: None, 2: {"v": 1}, 4: "d"}) == "[A] [B] [C] d"
+
+
+def test_batches_keep_small_sections_together_and_split_large_ones():
+    index = BlankIndex.build(DOCUMENT, DETECTOR)
+    assert [[o.id for o in batch] for batch in index.batches(3, 3000)] == [[1, 2], [3, 4], [5, 6, 7]]
+    assert [[o.id for o in batch] for batch in index.batches(2, 3000)] == [[1, 2], [3, 4], [5, 6], [7]]
+    assert all(len(batch) == 1 for batch in index.batches(10, 1))
+
+
+def test_from_strings_indexes_named_blanks():
+    index = BlankIndex.from_strings("Dear NAME, see NAME and NAMES", ["NAME", "NAMES"])
+    assert [(o.text, o.start) for o in index.occurrences] == [("NAME", 5), ("NAME", 15), ("NAMES", 24)]
+    assert index.splice({1: "a", 2: "b", 3: "c"}) == "Dear a, see b and c"
@@ -0,0 +1,63 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services import completion_cache, openai_service
+from app.services.completion_cache import CompletionCache
+from app.services.openai_service import OpenAIService
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(completion_cache.time, "time", clock)
+    cache = CompletionCache(str(tmp_path / "cache.db"), ttl_seconds=60)
+    cache.put("a", "first")
+    assert cache.get("a") == "first"
+    clock.now += 60
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted_first(tmp_path):
+    cache = CompletionCache(str(tmp_path / "cache.db"), max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert [cache.get(key) for key in "abc"] == ["1", None, "3"]
+
+
+def test_entries_stay_within_max_entries(tmp_path):
+    cache = CompletionCache(str(tmp_path / "cache.db"), max_entries=20)
+    for index in range(100):
+        cache.put(str(index), "value")
+        assert cache.stats()["entries"] <= 20
+    cache.put("99", "replaced")
+    # A second cache on the same file starts from the table's own count
+    assert CompletionCache(str(tmp_path / "cache.db"), max_entries=20)._entries == cache.stats()["entries"]
+
+
+def test_use_cache_false_always_calls_the_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(openai_service, "get_completion_cache", lambda: CompletionCache(str(tmp_path / "cache.db")))
+    calls = []
+
+    async def complete_async(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='{"filled_values": {}}'))])
+
+    messages = [{"role": "user", "content": "Fill [Name]"}]
+    for use_cache, expected in ((True, 1), (False, 2)):
+        calls.clear()
+        service = OpenAIService(use_cache=use_cache)
+        service.llm = SimpleNamespace(complete_async=complete_async)
+        for _ in range(2):
+            assert asyncio.run(service._complete_async(messages)) == '{"filled_values": {}}'
+        assert len(calls) == expected
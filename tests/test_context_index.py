@@ -0,0 +1,40 @@
+from app.services.context_index import ContextIndex, split_passages, tokenize
+from app.services.document_chunker import DocumentChunker
+from app.services.metrics import CONTEXT_TOKENS_TRIMMED
+from app.services.openai_service import OpenAIService
+
+CV = "Curriculum vitae. Name: Jane Roe. Email: jane.roe@example.com. Senior software engineer based in Turin."
+FILLER = "Quarterly logistics report, section {}: shipments moved through the northern warehouse on schedule."
+
+
+def test_tokenize_folds_accents_and_drops_stopwords():
+    assert tokenize("La Città è in the ___ Région") == ["citta", "region"]
+
+
+def test_long_paragraphs_are_split_into_bounded_passages():
+    text = "Short intro.\n\n" + " ".join(f"Sentence number {i} is here." for i in range(200))
+    passages = split_passages(text, 50)
+    assert passages[0].startswith("Short intro.")
+    assert all(DocumentChunker.estimate_tokens(passage) <= 60 for passage in passages)
+    assert " ".join(passages).count("Sentence number") == 200
+
+
+def test_search_ranks_matching_passages_and_select_keeps_their_order():
+    index = ContextIndex("Apples are red.\n\nBananas are yellow.\n\nRed apples and red cherries.", passage_tokens=8)
+    assert index.search("red cherries", 2) == [2, 0]
+    assert index.select("red cherries", 2) == "Apples are red.\n\nRed apples and red cherries."
+    # Nothing shares a term with the query: the first passages stand in
+    assert index.select("zebra", 1) == "Apples are red."
+
+
+def test_long_context_is_cut_to_the_passage_the_blanks_need():
+    filler = [FILLER.format(i) for i in range(4000)]
+    context = "\n\n".join(filler[:2000] + [CV] + filler[2000:])
+    assert DocumentChunker.estimate_tokens(context) > 50000
+
+    document = "Candidate name: [Name]\n\nContact email: [Email]"
+    trimmed = CONTEXT_TOKENS_TRIMMED.value()
+    selected = OpenAIService._relevant_context(context, ["[Name]", "[Email]"], document)
+    assert CV in selected
+    assert DocumentChunker.estimate_tokens(selected) <= 250
+    assert CONTEXT_TOKENS_TRIMMED.value() - trimmed > 50000
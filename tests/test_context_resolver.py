@@ -0,0 +1,46 @@
+from app.services.context_resolver import ContextResolver, normalize_key, parse_structured_context
+
+
+def test_key_value_lines_and_json_are_parsed():
+    assert parse_structured_context("Name: Jane Roe\n- Date = 2024-03-15\nfree text") == {
+        "Name": "Jane Roe", "Date": "2024-03-15"
+    }
+    assert parse_structured_context('{"company": {"name": "Acme"}, "tags": ["a", "b"], "empty": ""}') == {
+        "company name": "Acme", "name": "Acme", "tags": "a, b"
+    }
+
+
+def test_normalize_key_drops_delimiters_accents_and_case():
+    assert normalize_key("[Città di Nascita]") == "citta di nascita"
+    assert normalize_key("{{ first_name }}") == "first name"
+
+
+def test_blanks_resolve_by_name_token_set_and_close_match():
+    resolver = ContextResolver({"Date of Birth": "1990-01-01", "Company Name": "Acme", "Email": "j@x.it"})
+    resolved, unresolved = resolver.resolve(["[Birth date]", "<<company name>>", "[E-mail]", "[Phone]", "________"])
+    assert resolved == {"[Birth date]": "1990-01-01", "<<company name>>": "Acme", "[E-mail]": "j@x.it"}
+    assert unresolved == ["[Phone]", "________"]
+
+
+def test_fuzzy_matching_can_be_switched_off():
+    resolver = ContextResolver({"Email": "j@x.it"}, fuzzy_cutoff=1.0)
+    assert resolver.resolve(["[E-mail]"]) == ({}, ["[E-mail]"])
+
+
+def test_top_level_keys_win_over_leaf_aliases():
+    pairs = parse_structured_context('{"company": {"name": "Acme"}, "name": "Jane"}')
+    assert ContextResolver(pairs).resolve(["[Name]", "[Company Name]"]) == (
+        {"[Name]": "Jane", "[Company Name]": "Acme"}, []
+    )
+
+
+def test_close_matches_must_keep_their_numbers():
+    resolver = ContextResolver(parse_structured_context("Phone 1: 555\nAddres 2: Via Roma"))
+    assert resolver.resolve(["[Phone 2]", "[Address 2]"]) == ({"[Address 2]": "Via Roma"}, ["[Phone 2]"])
+
+
+def test_values_that_cannot_be_written_are_left_to_the_model():
+    pairs = parse_structured_context('{"active": true, "age": 42, "tags": ["a"]}')
+    assert ContextResolver(pairs).resolve(["[Active]", "[Age]", "[Tags]"]) == (
+        {"[Age]": 42, "[Tags]": "a"}, ["[Active]"]
+    )
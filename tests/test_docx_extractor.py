@@ -0,0 +1,65 @@
+import io
+
+from docx import Document
+
+from app.services.document_converter import DocumentConverter
+from app.services.docx_extractor import FOOTER_END, FOOTER_START, HEADER_END, HEADER_START, extract_markdown
+
+
+def save(document) -> bytes:
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+def test_blocks_in_body_order_with_tables_in_place():
+    document = Document()
+    document.add_heading("Title", level=1)
+    document.add_paragraph("Before")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text, table.cell(0, 1).text = "a", "b\nc"
+    table.cell(1, 0).merge(table.cell(1, 1)).text = "merged"
+    document.add_paragraph("After")
+    assert extract_markdown(save(document)).split("\n\n") == [
+        "# Title", "Before", "| a | b\nc |", "| --- | --- |", "| merged | merged |", "After"
+    ]
+
+
+def test_cell_text_matches_python_docx_without_nested_content():
+    document = Document()
+    table = document.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "one"
+    table.cell(0, 1).add_paragraph("two")
+    data = save(document)
+    cells = [cell.text for cell in Document(io.BytesIO(data)).tables[0].rows[0].cells]
+    assert extract_markdown(data).split("\n\n")[0] == "| " + " | ".join(cells) + " |"
+
+
+def test_headers_and_footers_are_marked_apart_from_the_body():
+    document = Document()
+    document.sections[0].header.paragraphs[0].text = "Ref [Number]"
+    document.sections[0].footer.paragraphs[0].text = "Page footer"
+    document.add_paragraph("Body")
+    assert extract_markdown(save(document)).split("\n\n") == [
+        HEADER_START, "Ref [Number]", HEADER_END, "Body", FOOTER_START, "Page footer", FOOTER_END
+    ]
+
+
+def test_rebuilt_document_puts_headers_and_footers_back():
+    markdown = "\n\n".join([HEADER_START, "Ref 42", "Ref 42", HEADER_END, "Body", FOOTER_START, "Page footer", FOOTER_END])
+    rebuilt = Document(io.BytesIO(DocumentConverter().markdown_to_docx(markdown)))
+    assert [p.text for p in rebuilt.paragraphs] == ["Body"]
+    assert [p.text for p in rebuilt.sections[0].header.paragraphs] == ["Ref 42"]
+    assert [p.text for p in rebuilt.sections[0].footer.paragraphs] == ["Page footer"]
+
+
+def test_repeated_header_parts_are_all_kept():
+    document = Document()
+    section = document.sections[0]
+    section.different_first_page_header_footer = True
+    section.header.paragraphs[0].text = "Ref ____"
+    section.first_page_header.paragraphs[0].text = "Ref ____"
+    document.add_paragraph("Body")
+    assert extract_markdown(save(document)).split("\n\n") == [
+        HEADER_START, "Ref ____", "Ref ____", HEADER_END, "Body"
+    ]
@@ -0,0 +1,143 @@
+import io
+import zipfile
+
+from docx import Document
+from lxml import etree
+
+from app.services.blank_detector import BlankDetector
+from app.services.docx_extractor import W_NS, extract_markdown
+from app.services.docx_filler import OccurrenceValues, _splice, fill_docx, recover_values
+
+DETECTOR = BlankDetector(["brackets", "underscores"])
+MC_NS = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+RELS = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"'
+    ' Target="word/document.xml"/></Relationships>'
+)
+
+
+def paragraph(*runs: str) -> str:
+    return "<w:p>" + "".join(f'<w:r><w:t xml:space="preserve">{run}</w:t></w:r>' for run in runs) + "</w:p>"
+
+
+def text_box(choice: str, fallback: str) -> str:
+    return (
+        "<w:p><w:r><mc:AlternateContent>"
+        f"<mc:Choice Requires=\"wps\"><w:txbxContent>{choice}</w:txbxContent></mc:Choice>"
+        f"<mc:Fallback><w:txbxContent>{fallback}</w:txbxContent></mc:Fallback>"
+        "</mc:AlternateContent></w:r></w:p>"
+    )
+
+
+def package(body: str) -> bytes:
+    document = f'<w:document xmlns:w="{W_NS}" xmlns:mc="{MC_NS}"><w:body>{body}</w:body></w:document>'
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w") as archive:
+        archive.writestr("_rels/.rels", RELS)
+        archive.writestr("word/document.xml", document)
+    return output.getvalue()
+
+
+def save(document) -> bytes:
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+def texts(docx: bytes):
+    with zipfile.ZipFile(io.BytesIO(docx)) as archive:
+        root = etree.fromstring(archive.read("word/document.xml"))
+    return ["".join(p.itertext()) for p in root.iter(f"{{{W_NS}}}p") if not len(p.findall(f".//{{{W_NS}}}p"))]
+
+
+def test_recover_values_reads_unambiguous_fills():
+    source = "Name: [Name]\n\nDate: [Date]\n\nSigned ____"
+    filled = "Name: Jane Roe\n\nDate: 1 May\n\nSigned here"
+    assert recover_values(source, filled, DETECTOR) == ["Jane Roe", "1 May", "here"]
+
+
+def test_recover_values_rejects_ambiguous_alignments():
+    assert recover_values("Name: [First] [Last].", "Name: John Paul Smith.", DETECTOR) is None
+    assert recover_values("Signed [City], [Date]", "Signed Rome, Italy, 2024-01-01", DETECTOR) is None
+    assert recover_values("[A][B]", "xy", DETECTOR) is None
+
+
+def test_recover_values_rejects_changed_text():
+    assert recover_values("Hello [Name].", "Hi Jane.", DETECTOR) is None
+    assert recover_values("Hello [Name].", "Hello Jane!", DETECTOR) is None
+
+
+def test_occurrence_values_carry_through_steps():
+    occurrences = OccurrenceValues("[A] and [A] and [B]", DETECTOR)
+    values = occurrences.carry(occurrences.initial(), occurrences.source, {2: "second"})
+    assert values == [None, "second", None]
+    document = occurrences.text(values)
+    assert document == "[A] and second and [B]"
+    # The next step numbers only the blanks still open in its input
+    values = occurrences.carry(values, document, {1: "first", 2: None})
+    assert values == ["first", "second", None]
+
+
+def test_occurrence_values_give_up_when_blanks_do_not_line_up():
+    occurrences = OccurrenceValues("[A] and [B]", DETECTOR)
+    values = occurrences.carry(occurrences.initial(), occurrences.source, {1: "[C]"})
+    assert occurrences.carry(values, occurrences.text(values), {1: "x"}) is None
+    assert occurrences.carry(None, occurrences.source, {1: "x"}) is None
+
+
+def test_splice_across_nodes():
+    assert _splice(["Dear [Na", "me], ", "hi"], [(5, 11, "Jane")]) == ["Dear Jane", ", ", "hi"]
+    assert _splice(["[A][B]"], [(0, 3, "x"), (3, 6, "y")]) == ["xy"]
+
+
+def test_fill_docx_writes_each_occurrence_its_own_value():
+    docx = package(paragraph("Party A: ", "____") + paragraph("Party B: __", "__") + paragraph("[Date]"))
+    filled = fill_docx(docx, ["Acme", "Beta", None], DETECTOR)
+    assert texts(filled) == ["Party A: Acme", "Party B: Beta", "[Date]"]
+
+
+def test_fill_docx_gives_text_box_fallbacks_the_primary_values():
+    box = paragraph("From ____ to ____")
+    docx = package(paragraph("Intro ____") + text_box(box, box))
+    assert extract_markdown(docx).count("____") == 3
+    filled = fill_docx(docx, ["one", "two", "three"], DETECTOR)
+    assert texts(filled) == ["Intro one", "From two to three", "From two to three"]
+
+
+def test_fill_docx_returns_the_package_unchanged_without_values():
+    docx = package(paragraph("[A]"))
+    assert fill_docx(docx, [None], DETECTOR) is docx
+
+
+def test_fill_docx_gives_repeated_headers_and_merged_cells_their_own_values():
+    document = Document()
+    section = document.sections[0]
+    section.different_first_page_header_footer = True
+    section.header.paragraphs[0].text = "Ref ____"
+    section.first_page_header.paragraphs[0].text = "Ref ____"
+    document.add_paragraph("Party A: ____ Party B: ____")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).merge(table.cell(0, 1)).text = "Signed ____"
+    table.cell(1, 0).text, table.cell(1, 1).text = "[Date]", "[Place]"
+    docx = save(document)
+    occurrences = OccurrenceValues(extract_markdown(docx), DETECTOR)
+    # Two header parts, the body paragraph, the merged cell shown in both columns, then the second row
+    assert [match.text for match in occurrences.matches] == ["____"] * 6 + ["[Date]", "[Place]"]
+
+    filled = Document(io.BytesIO(fill_docx(docx, ["ref 1", "ref 2", "a", "b", "signed", "signed", None, "Rome"],
+                                           DETECTOR)))
+    assert filled.paragraphs[0].text == "Party A: a Party B: b"
+    assert {filled.sections[0].first_page_header.paragraphs[0].text,
+            filled.sections[0].header.paragraphs[0].text} == {"Ref ref 1", "Ref ref 2"}
+    assert [cell.text for cell in filled.tables[0].rows[0].cells] == ["Signed signed"] * 2
+    assert [cell.text for cell in filled.tables[0].rows[1].cells] == ["[Date]", "Rome"]
+
+
+def test_fill_docx_gives_up_when_values_do_not_line_up():
+    docx = package(paragraph("[A] and [B]"))
+    assert fill_docx(docx, ["x"], DETECTOR) is None
+    # A blank split by a tab reads differently in the paragraph than in the markdown
+    split = package('<w:p><w:r><w:t>[A</w:t><w:tab/><w:t>]</w:t></w:r></w:p>')
+    assert fill_docx(split, ["x"], DETECTOR) is None
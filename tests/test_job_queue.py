@@ -0,0 +1,126 @@
+import asyncio
+import os
+import shutil
+import time
+
+from app.services.job_queue import COMPLETED, RUNNING, JobQueue, JobStore
+
+
+def make_queue(store, runs, **kwargs):
+    queue = JobQueue(store, workers=2, **kwargs)
+
+    async def handler(params, inputs, progress):
+        runs.append(params["n"])
+        await asyncio.sleep(0.01)
+        return {"n": params["n"]}
+
+    queue.register("test", handler)
+    return queue
+
+
+async def wait_for_jobs(store, job_ids, timeout=5.0):
+    async def done():
+        while any(store.load(job_id)["status"] != COMPLETED for job_id in job_ids):
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(done(), timeout)
+
+
+def test_backlog_larger_than_the_queue_is_recovered(tmp_path):
+    store = JobStore(str(tmp_path))
+    job_ids = [store.create("test", {"n": n}, [])["id"] for n in range(7)]
+    runs = []
+
+    async def run():
+        queue = make_queue(store, runs, max_queued=2)
+        await queue.start()
+        try:
+            await wait_for_jobs(store, job_ids)
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+    assert sorted(runs) == list(range(7))
+
+
+def test_workers_sharing_a_store_run_each_job_once(tmp_path):
+    store = JobStore(str(tmp_path))
+    job_ids = [store.create("test", {"n": n}, [])["id"] for n in range(10)]
+    runs = []
+
+    async def run():
+        # Two queues stand in for two worker processes; each sees every job on recovery
+        queues = [make_queue(JobStore(str(tmp_path)), runs) for _ in range(2)]
+        for queue in queues:
+            await queue.start()
+        try:
+            await wait_for_jobs(store, job_ids)
+        finally:
+            for queue in queues:
+                await queue.stop()
+
+    asyncio.run(run())
+    assert sorted(runs) == list(range(10))
+
+
+def test_a_job_held_by_a_live_worker_is_not_requeued(tmp_path):
+    store = JobStore(str(tmp_path))
+    job = store.create("test", {"n": 1}, [])
+    job["status"] = RUNNING
+    store.save(job)
+    held = store.claim(job["id"])
+    runs = []
+
+    async def run():
+        queue = make_queue(JobStore(str(tmp_path)), runs, recovery_interval=0.01)
+        await queue.start()
+        await asyncio.sleep(0.1)
+        assert runs == []
+        # Once its holder is gone the job is picked up again
+        store.release(held)
+        await wait_for_jobs(store, [job["id"]])
+        await queue.stop()
+
+    asyncio.run(run())
+    assert runs == [1]
+
+
+def test_finished_jobs_leave_the_index_and_a_missing_index_is_rebuilt(tmp_path):
+    store = JobStore(str(tmp_path))
+    done, queued = store.create("test", {"n": 1}, []), store.create("test", {"n": 2}, [])
+    done["status"] = COMPLETED
+    store.save(done)
+    assert [job["id"] for job in store.unfinished_jobs()] == [queued["id"]]
+
+    shutil.rmtree(tmp_path / ".unfinished")
+    assert [job["id"] for job in JobStore(str(tmp_path)).unfinished_jobs()] == [queued["id"]]
+
+
+def test_only_finished_jobs_past_retention_are_removed(tmp_path):
+    store = JobStore(str(tmp_path))
+    old, recent, queued = (store.create("test", {"n": n}, [("input.txt", b"x")]) for n in range(3))
+    for job in (old, recent):
+        job["status"] = COMPLETED
+        store.save(job)
+    for job in (old, queued):
+        os.utime(tmp_path / job["id"] / "job.json", (time.time() - 120, time.time() - 120))
+
+    assert store.remove_finished(60) == 1
+    assert store.load(old["id"]) is None
+    assert store.load(recent["id"]) is not None and store.load(queued["id"]) is not None
+
+
+def test_submitted_job_runs(tmp_path):
+    store = JobStore(str(tmp_path))
+    runs = []
+
+    async def run():
+        queue = make_queue(store, runs)
+        await queue.start()
+        try:
+            job = await queue.submit("test", {"n": 5}, [("input.txt", b"data")])
+            await wait_for_jobs(store, [job["id"]])
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+    assert runs == [5]
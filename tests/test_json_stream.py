@@ -0,0 +1,30 @@
+from app.services.json_stream import ObjectMemberParser
+
+REPLY = '{"note": {"x": 1}, "filled_values": {"[Name]": "Jane \\"JR\\" Roe", "[Age]": 42, "[Tags]": ["a", "b"]}}'
+
+
+def test_members_arrive_as_soon_as_each_pair_is_complete():
+    parser = ObjectMemberParser()
+    received = []
+    for character in REPLY:
+        for member in parser.feed(character):
+            received.append((member, len(received)))
+    assert [member for member, _ in received] == [
+        ("[Name]", 'Jane "JR" Roe'), ("[Age]", 42), ("[Tags]", ["a", "b"])
+    ]
+    assert parser.done
+
+
+def test_a_number_waits_for_its_delimiter():
+    parser = ObjectMemberParser()
+    assert parser.feed('{"filled_values": {"[Age]": 4') == []
+    assert parser.feed('2') == []
+    assert parser.feed('}') == [("[Age]", 42)]
+    assert parser.feed('}') == []
+    assert parser.done
+
+
+def test_only_the_named_object_is_read():
+    parser = ObjectMemberParser("values")
+    assert parser.feed('{"other": {"a": 1}, ') == []
+    assert parser.feed('"values": {"b": null}}') == [("b", None)]
@@ -0,0 +1,176 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from app.services.llm_client import LLMClientManager, TokenBucket
+from app.services.metrics import LLM_REQUESTS, LLM_TOKENS
+from benchmarks.mock_llm_server import MockLLMServer
+
+
+def chunk(content=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=content))] if content is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for item in self.chunks:
+            yield item
+
+
+def manager(create):
+    client = LLMClientManager("test-key", tokens_per_minute=100000, max_retries=0)
+
+    async def get_async_client():
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    client._get_async_client = get_async_client
+    return client
+
+
+async def collect(client):
+    return [text async for text in client.stream_async(model="m", messages=[{"role": "user", "content": "hi"}])]
+
+
+def test_stream_without_usage_is_recorded_as_an_estimate():
+    async def create(**kwargs):
+        return FakeStream([chunk("Hello "), chunk("world")])
+
+    client = manager(create)
+    successes = LLM_REQUESTS.value(outcome="success")
+    estimated = LLM_REQUESTS.value(outcome="success_no_usage")
+    completion_tokens = LLM_TOKENS.value(type="completion")
+    estimated_tokens = LLM_TOKENS.value(type="completion_estimated")
+
+    assert asyncio.run(collect(client)) == ["Hello ", "world"]
+    assert LLM_REQUESTS.value(outcome="success") == successes
+    assert LLM_REQUESTS.value(outcome="success_no_usage") == estimated + 1
+    assert LLM_TOKENS.value(type="completion") == completion_tokens
+    assert LLM_TOKENS.value(type="completion_estimated") == estimated_tokens + len("Hello world") // 4 + 1
+
+
+def test_stream_with_usage_settles_with_it():
+    usage = SimpleNamespace(prompt_tokens=3, completion_tokens=2, total_tokens=5)
+
+    async def create(**kwargs):
+        return FakeStream([chunk("Hi"), chunk(usage=usage)])
+
+    client = manager(create)
+    successes = LLM_REQUESTS.value(outcome="success")
+    completion_tokens = LLM_TOKENS.value(type="completion")
+
+    assert asyncio.run(collect(client)) == ["Hi"]
+    assert LLM_REQUESTS.value(outcome="success") == successes + 1
+    assert LLM_TOKENS.value(type="completion") == completion_tokens + 2
+
+
+def test_non_retryable_errors_are_counted():
+    async def create(**kwargs):
+        raise ValueError("bad request")
+
+    client = manager(create)
+    failures = LLM_REQUESTS.value(outcome="ValueError")
+    with pytest.raises(ValueError):
+        asyncio.run(collect(client))
+    with pytest.raises(ValueError):
+        asyncio.run(client.complete_async(model="m", messages=[]))
+    assert LLM_REQUESTS.value(outcome="ValueError") == failures + 2
+
+
+def test_async_client_from_a_previous_loop_is_closed():
+    client = LLMClientManager("test-key")
+    first = asyncio.run(client._get_async_client())
+    second = asyncio.run(client._get_async_client())
+    assert second is not first
+    assert first.is_closed()
+    assert not second.is_closed()
+    asyncio.run(client.aclose())
+
+
+@pytest.fixture
+def mock_server():
+    servers = []
+
+    def start(**options):
+        server = MockLLMServer(latency=0.0, tokens_per_second=0, **options).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def ask(client, index=0):
+    return client.complete_async(model="mock", messages=[{"role": "user", "content": f"Fill [Name] {index}"}])
+
+
+def test_concurrent_calls_survive_rate_limiting(mock_server):
+    server = mock_server(error_rate=0.5, seed=1)
+    client = LLMClientManager("test-key", server.base_url, max_retries=20, backoff_base_seconds=0.001,
+                              backoff_max_seconds=0.01)
+    throttled = LLM_REQUESTS.value(outcome="RateLimitError")
+
+    async def run():
+        try:
+            return await asyncio.gather(*(ask(client, index) for index in range(20)))
+        finally:
+            await client.aclose()
+
+    completions = asyncio.run(run())
+    assert len(completions) == 20 and all(completion.choices[0].message.content for completion in completions)
+    assert server.rate_limited > 0
+    assert server.requests == 20 + server.rate_limited
+    assert LLM_REQUESTS.value(outcome="RateLimitError") == throttled + server.rate_limited
+
+
+def test_retry_after_is_honoured_and_retries_are_bounded(mock_server):
+    server = mock_server(error_rate=1.0)
+    client = LLMClientManager("test-key", server.base_url, max_retries=2, backoff_base_seconds=0.001)
+
+    async def run():
+        try:
+            await ask(client)
+        finally:
+            await client.aclose()
+
+    started = time.monotonic()
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(run())
+    # Two retries, each waiting at least the server's retry-after of 0.1s
+    assert time.monotonic() - started >= 0.2
+    assert server.requests == 3
+
+
+def test_request_bucket_spaces_out_calls(mock_server):
+    server = mock_server()
+    client = LLMClientManager("test-key", server.base_url)
+    client.request_bucket = TokenBucket(1200, capacity=1)  # 20 requests a second, no burst
+
+    async def run():
+        try:
+            await asyncio.gather(*(ask(client, index) for index in range(5)))
+        finally:
+            await client.aclose()
+
+    started = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - started >= 0.19
+    assert server.requests == 5
+
+
+def test_token_bucket_goes_into_debt_and_refunds():
+    bucket = TokenBucket(60)  # One token a second
+    assert bucket.reserve(60) == 0
+    assert bucket.reserve(30) == pytest.approx(30, abs=0.1)
+    bucket.refund(30)
+    assert bucket.reserve(0) == pytest.approx(0, abs=0.1)
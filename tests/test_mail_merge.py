@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from app.services.mail_merge import MailMerge, gather_or_cancel, parse_rows, row_path
+
+
+class FakePool:
+    async def docx_to_markdown(self, file_content):
+        return file_content.decode()
+
+    async def markdown_to_docx(self, markdown_text):
+        return markdown_text.encode()
+
+
+class FakeService:
+    """Answers every record except those listed in skip; rows in partial get no [Date]."""
+
+    def __init__(self, skip=(), partial=(), fail=False):
+        self.skip, self.partial, self.fail = set(skip), set(partial), fail
+        self.calls = []
+
+    async def find_blanks_async(self, text):
+        return ["[Name]", "[Date]"]
+
+    async def fill_records_async(self, blanks, records, context="", example=None):
+        self.calls.append(sorted(records))
+        if self.fail:
+            raise RuntimeError("model down")
+        values = {}
+        for record_id, record in records.items():
+            if record_id in self.skip:
+                continue
+            values[record_id] = {"[Name]": record["name"], "[Date]": None if record_id in self.partial else "today"}
+        return values
+
+
+def merge(service, tmp_path, rows_per_completion=10):
+    return MailMerge(service, FakePool(), rows_per_completion=rows_per_completion, concurrency=2).run(
+        b"Dear [Name], [Date]", [{"name": f"n{i}"} for i in range(1, 6)], tmp_path
+    )
+
+
+def test_rows_missing_or_incomplete_are_not_written_and_resume_retries_them(tmp_path):
+    service = FakeService(skip={"2"}, partial={"4"})
+    summary = asyncio.run(merge(service, tmp_path))
+    assert summary["failed"] == [2, 4]
+    # The packed call, then one single-row retry per unanswered row
+    assert service.calls == [["1", "2", "3", "4", "5"], ["2"], ["4"]]
+    assert row_path(tmp_path, 0).read_bytes() == b"Dear n1, today"
+    assert not row_path(tmp_path, 1).exists()
+    assert not row_path(tmp_path, 3).exists()
+
+    retry = FakeService()
+    summary = asyncio.run(merge(retry, tmp_path))
+    assert retry.calls == [["2", "4"]]
+    assert summary["resumed"] == 3 and summary["failed"] == []
+    assert row_path(tmp_path, 3).read_bytes() == b"Dear n4, today"
+
+
+def test_a_template_without_blanks_writes_every_row_without_completions(tmp_path):
+    class NoBlanks(FakeService):
+        async def find_blanks_async(self, text):
+            return []
+
+    service = NoBlanks()
+    summary = asyncio.run(MailMerge(service, FakePool(), concurrency=2).run(
+        b"Plain letter", [{"name": "a"}, {"name": "b"}], tmp_path
+    ))
+    assert summary["failed"] == [] and summary["completions"] == 0
+    assert service.calls == []
+    assert row_path(tmp_path, 0).read_bytes() == row_path(tmp_path, 1).read_bytes() == b"Plain letter"
+
+
+def test_a_failing_batch_cancels_the_others():
+    finished = []
+
+    async def slow():
+        await asyncio.sleep(5)
+        finished.append(True)
+
+    async def broken():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await gather_or_cancel(slow(), broken())
+        return [task for task in asyncio.all_tasks() if not task.done() and task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+    assert finished == []
+
+
+def test_parse_rows():
+    assert parse_rows(b"name,city\nAda,Rome\n", "rows.csv") == [{"name": "Ada", "city": "Rome"}]
+    assert parse_rows(b'{"name": "Ada"}\n\n{"name": "Bo"}\n', "rows.jsonl") == [{"name": "Ada"}, {"name": "Bo"}]
+    with pytest.raises(ValueError):
+        parse_rows(b"[1]\n", "rows.jsonl")
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services.pipeline_compiler import compile_pipeline
+
+PIPELINE = {"nodes": [
+    {"id": "in", "type": "DOCUMENT_INPUT"},
+    {"id": "template", "type": "TEMPLATE_MODEL", "data": {"template_values": {"Name": "Ada"}}},
+    {"id": "out", "type": "DOCUMENT_OUTPUT"},
+]}
+
+
+def test_output_content_is_returned_for_every_document_output():
+    with TestClient(main.app) as client:
+        response = client.post(
+            "/api/pipeline/execute",
+            files=[("files", ("letter.md", b"Dear [Name],", "text/markdown"))],
+            data={"pipeline_config": json.dumps(PIPELINE)},
+        )
+    assert response.status_code == 200
+    result = response.json()["results"][0]
+    assert result["content"] == "Dear Ada,"
+    assert result["metadata"]["output_content"] == "Dear Ada,"
+    assert "docx_content" not in result["metadata"]
+
+
+class Upload:
+    def __init__(self, filename):
+        self.filename = filename
+
+    async def read(self):
+        return b"text"
+
+
+def test_streamed_archive_cancels_pending_files_when_the_client_leaves(monkeypatch):
+    started, cancelled = [], []
+
+    async def process(filename, content, plan, progress=None, services=None):
+        started.append(filename)
+        if filename == "fast.md":
+            return {"content": "done", "docx": None, "metadata": {}}
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(filename)
+            raise
+
+    monkeypatch.setattr(main, "process_content_through_pipeline", process)
+
+    async def run():
+        archive = main.stream_pipeline_archive([Upload("slow.md"), Upload("fast.md")], compile_pipeline(PIPELINE))
+        assert await archive.__anext__()  # The fast file's entry
+        await archive.aclose()
+        await asyncio.sleep(0)
+
+    asyncio.run(asyncio.wait_for(run(), 5))
+    assert sorted(started) == ["fast.md", "slow.md"]
+    assert cancelled == ["slow.md"]
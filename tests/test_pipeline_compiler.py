@@ -0,0 +1,47 @@
+import pytest
+
+from app.services.pipeline_compiler import UPLOAD_SOURCE, PipelineCompileError, compile_pipeline
+
+
+def block(block_id, block_type, **config):
+    return {"id": block_id, "type": block_type, "config": config}
+
+
+def test_flat_block_list_chains_documents_in_order():
+    plan = compile_pipeline({"blocks": [
+        block("in", "DOCUMENT_INPUT"), block("gpt", "GPT_MODEL"), block("out", "DOCUMENT_OUTPUT")
+    ]})
+    assert [step.id for step in plan.steps] == ["in", "gpt", "out"]
+    assert [(step.document_source, step.level) for step in plan.steps] == [(None, 0), ("in", 1), ("gpt", 2)]
+
+
+def test_independent_branches_share_a_level_and_context_is_collected():
+    plan = compile_pipeline({
+        "nodes": [
+            {"id": "ctx", "type": "TEXT_INPUT", "data": {"text": "Name: Jane"}},
+            {"id": "a", "type": "GPT_MODEL", "data": {}},
+            {"id": "b", "type": "TEMPLATE_MODEL", "data": {}},
+        ],
+        "edges": [
+            {"sourceId": "ctx", "targetId": "a", "targetInput": "context"},
+        ],
+    })
+    steps = {step.id: step for step in plan.steps}
+    assert steps["a"].context == "Name: Jane"
+    assert steps["a"].document_source is UPLOAD_SOURCE
+    # Without a document edge, b takes the previous document-carrying block
+    assert steps["b"].document_source == "a"
+    assert [[step.id for step in level] for level in plan.levels] == [["ctx"], ["a"], ["b"]]
+
+
+@pytest.mark.parametrize("config, message", [
+    ({"blocks": [block("x", "NOPE")]}, "Unknown block type"),
+    ({"blocks": [block("x", "GPT_MODEL"), block("x", "GPT_MODEL")]}, "Duplicate node id"),
+    ({"nodes": [{"id": "a", "type": "GPT_MODEL"}], "edges": [{"sourceId": "z", "targetId": "a"}]}, "missing node"),
+    ({"nodes": [{"id": "a", "type": "GPT_MODEL"}, {"id": "b", "type": "GPT_MODEL"}],
+      "edges": [{"sourceId": "a", "targetId": "b"}, {"sourceId": "b", "targetId": "a"}]}, "cycle through: a, b"),
+    ({}, "either 'blocks' or 'nodes'"),
+])
+def test_invalid_pipelines_are_rejected(config, message):
+    with pytest.raises(PipelineCompileError, match=message):
+        compile_pipeline(config)
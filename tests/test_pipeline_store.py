@@ -0,0 +1,66 @@
+import json
+import os
+
+from app.services.pipeline_store import PipelineStore
+
+
+def test_saves_keep_version_history(tmp_path):
+    store = PipelineStore(str(tmp_path / "p.sqlite3"))
+    assert store.save("a", {"nodes": [1]}) == 1
+    assert store.save("a", {"nodes": [1]}) == 1  # Unchanged config, no new version
+    assert store.save("a", {"nodes": [2]}) == 2
+    assert store.get("a").config == {"nodes": [2]}
+    assert store.get("a", 1).config == {"nodes": [1]}
+    assert store.get("a", 3) is None
+    assert store.get("missing") is None
+    assert [v["version"] for v in store.versions("a")] == [2, 1]
+
+
+def test_names_that_look_like_versions_do_not_collide(tmp_path):
+    store = PipelineStore(str(tmp_path / "p.sqlite3"))
+    store.save("a", {"v": "a1"})
+    store.save("a@1", {"v": "a@1"})
+    assert store.get("a", 1).config == {"v": "a1"}
+    assert store.get("a@1").config == {"v": "a@1"}
+    assert store.get("a", 1).config == {"v": "a1"}
+
+
+def test_list_pages_and_filters(tmp_path):
+    store = PipelineStore(str(tmp_path / "p.sqlite3"))
+    for index in range(5):
+        store.save(f"report_{index}", {}, created_at=1000 + index)
+    store.save("invoice", {}, created_at=2000)
+    page, total = store.list(offset=1, limit=2)
+    assert total == 6
+    assert [p["name"] for p in page] == ["report_4", "report_3"]
+    page, total = store.list(query="report_")
+    assert total == 5
+    # LIKE wildcards in the query are taken literally
+    assert store.list(query="%")[1] == 0
+
+
+def test_writes_from_another_connection_invalidate_the_cache(tmp_path):
+    path = str(tmp_path / "p.sqlite3")
+    store, other = PipelineStore(path), PipelineStore(path)
+    store.save("a", {"v": 1})
+    assert store.get("a").config == {"v": 1}
+    other.save("a", {"v": 2})
+    assert store.get("a").config == {"v": 2}
+
+
+def test_migrates_json_files_once(tmp_path):
+    legacy = tmp_path / "saved"
+    legacy.mkdir()
+    (legacy / "one.json").write_text(json.dumps({"name": "one"}))
+    (legacy / "two.json").write_text(json.dumps({"name": "two"}))
+    (legacy / "broken.json").write_text("{")
+    os.utime(legacy / "one.json", (1000, 1000))
+
+    path = str(tmp_path / "p.sqlite3")
+    store = PipelineStore(path)
+    store.save("two", {"name": "two", "edited": True})
+    assert store.migrate_directory(str(legacy)) == 1
+    assert store.get("one").created_at == 1000
+    assert store.get("two").config == {"name": "two", "edited": True}
+    # Another worker running the same migration adds nothing
+    assert PipelineStore(path).migrate_directory(str(legacy)) == 0
@@ -0,0 +1,20 @@
+from app.services.substitution import fill_text, substitute
+
+
+def test_replaces_every_occurrence_in_one_pass():
+    assert substitute("[A] and [A], [B]", {"[A]": "x", "[B]": "[A]"}) == "x and x, [A]"
+
+
+def test_longest_key_wins():
+    assert substitute("[Name] [Name2]", {"[Name]": "a", "[Name2]": "b"}) == "a b"
+
+
+def test_unusable_values_leave_the_placeholder():
+    values = {"[A]": None, "[B]": {"x": 1}, "[C]": ["y"], "[D]": 3, "[E]": True}
+    assert substitute("[A] [B] [C] [D] [E]", values) == "[A] [B] [C] 3 [E]"
+
+
+def test_fill_text():
+    assert fill_text("") == ""
+    assert fill_text(2.5) == "2.5"
+    assert fill_text(None) is None